@@ -0,0 +1,317 @@
+"""Local asynchronous HTTP API for persona, recommendations and quiz scoring
+
+Uses only the standard library. Quiz definitions and per-student aggregates stay in memory
+between requests; concurrent scoring requests for the same quiz are batched onto one index
+lookup, and per-student reports are cached until a new submission for that student arrives.
+Question difficulties are refitted in a worker thread at most once per CALIBRATION_DELAY after
+new responses; reports keep using the last fitted estimates in the meantime.
+
+    python analysis_service.py --port 8600 --quiz data/LLQT.json --historical data/XgAgFJ.json
+    python analysis_service.py --port 8600 --snapshot snapshots/latest
+
+Endpoints:
+    GET  /health
+    POST /quizzes                          quiz definition (as in data/LLQT.json)
+    POST /submissions                      one submission or a list of submissions
+    GET  /students/<user_id>/persona
+    GET  /students/<user_id>/recommendations
+    GET  /students/<user_id>/report        persona, recommendations, strategies and summary
+    POST /quizzes/<quiz_id>/score          one submission (or {"response_map": ...}) or a list
+"""
+import argparse
+import asyncio
+import json
+import re
+from typing import Dict, List, Any, Optional, Tuple
+
+from cohort_analysis import CohortAnalyzer
+from cohort_snapshot import CohortSnapshot
+from question_difficulty import DifficultyCalibrator, fit_rasch
+from quiz_scoring import QuizIndex, QuizScorer
+from submission_stream import StreamingAggregator, iter_submissions
+from reports import build_report
+from records import as_submission_record
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+CALIBRATION_DELAY = 1.0  # seconds of new responses batched into one difficulty refit
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+               500: 'Internal Server Error'}
+
+
+class ServiceError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AnalysisService:
+    """In-memory analysis state shared by all requests"""
+
+    def __init__(self, scorer: QuizScorer = None):
+        self.scorer = scorer or QuizScorer()
+        self.cohort = CohortAnalyzer()
+        self.cohort.load_aggregates({})
+        self.cohort.difficulty = DifficultyCalibrator(self.scorer)
+        # Reports never refit on the event loop; _calibrate does it in a worker thread
+        self.cohort.difficulty.refit_on_read = False
+        self._calibration: Optional[asyncio.Task] = None
+        self.quizzes: Dict[Any, Dict] = {}
+        self._reports: Dict[str, Dict[str, Any]] = {}
+        self._pending_scores: Dict[Any, List[Tuple[Dict, asyncio.Future]]] = {}
+
+    def add_quiz(self, quiz: Dict) -> QuizIndex:
+        index = self.scorer.index_for(quiz)
+        self.quizzes[index.quiz_id] = index.summary()
+        return index
+
+    def load_snapshot(self, path: str):
+        """Start from a memory-mapped cohort snapshot; students are read from it as they are requested"""
+        snapshot = CohortSnapshot(path)
+        self.cohort.load_aggregates(snapshot.aggregates, snapshot.peers)
+        self.cohort.similar = snapshot.similar
+        self._reports.clear()
+
+    def load_history(self, *sources: str, batch_size: int = 10000):
+        """Warm the per-student aggregates from submission exports"""
+        aggregator = StreamingAggregator(batch_size)
+        aggregator.aggregates = self.cohort.aggregates
+        aggregator.peers = self.cohort.peers
+        for source in sources:
+            for record in iter_submissions(source):
+                if record.quiz_id in self.quizzes:
+                    self.cohort.difficulty.add_submission(record, self.quizzes[record.quiz_id])
+                    record.question_ids = record.option_ids = None
+                aggregator.add(record)
+        aggregator.flush()
+        # Preloading happens before serving, so the first fit can block
+        self.cohort.difficulty.calibrate()
+        self._reports.clear()
+
+    def add_submission(self, submission: Dict) -> str:
+        record = as_submission_record(submission)
+        if record.quiz_id in self.quizzes:
+            # Responses to known quizzes feed the question difficulty calibration
+            self.cohort.difficulty.add_submission(record, self.quizzes[record.quiz_id])
+            self._schedule_calibration()
+        self.cohort.add_submission(record)
+        # Every cached report's peer percentiles and similar students can move, not just this student's
+        self._reports.clear()
+        return record.user_id
+
+    def _schedule_calibration(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not serving (e.g. preloading from a script): fit right away
+            self.cohort.difficulty.calibrate()
+            return
+        if self._calibration is None:
+            self._calibration = loop.create_task(self._calibrate())
+
+    async def _calibrate(self):
+        """Refit question difficulties off the event loop until they cover every response"""
+        calibrator = self.cohort.difficulty
+        loop = asyncio.get_running_loop()
+        try:
+            while calibrator.stale:
+                # Let a burst of submissions accumulate into one refit
+                await asyncio.sleep(CALIBRATION_DELAY)
+                inputs = calibrator.fit_inputs()
+                if inputs is None:
+                    break
+                difficulty, ability, _ = await loop.run_in_executor(None, fit_rasch, *inputs)
+                calibrator.apply_fit(difficulty, ability)
+                self._reports.clear()
+        finally:
+            self._calibration = None
+
+    def report(self, user_id: str) -> Dict[str, Any]:
+        report = self._reports.get(user_id)
+        if report is None:
+            if user_id not in self.cohort.aggregates:
+                raise ServiceError(404, f"Unknown student {user_id}")
+            report = self._reports[user_id] = build_report(self.cohort.analyzer_for(user_id))
+        return report
+
+    async def score(self, quiz_id: Any, response_map: Dict) -> Dict[str, Any]:
+        """Score a response_map; requests arriving in the same loop iteration share one batch"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending_scores.get(quiz_id)
+        if batch is None:
+            batch = self._pending_scores[quiz_id] = []
+            loop.call_soon(self._flush_scores, quiz_id)
+        batch.append((response_map, future))
+        return await future
+
+    def _flush_scores(self, quiz_id: Any):
+        batch = self._pending_scores.pop(quiz_id)
+        quiz = self.quizzes.get(quiz_id)
+        if quiz is None:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(ServiceError(404, f"Unknown quiz {quiz_id}"))
+            return
+        try:
+            index = self.scorer.index_for(quiz)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for response_map, future in batch:
+            if future.done():
+                continue
+            # A malformed response_map fails only its own request, never the rest of the batch
+            try:
+                future.set_result(index.score(response_map))
+            except Exception as error:
+                future.set_exception(ServiceError(400, f"Invalid response_map: {error}"))
+
+
+def _parse_id(value: str) -> Any:
+    return int(value) if value.isdigit() else value
+
+
+class AnalysisHTTPServer:
+    """Minimal HTTP/1.1 front end (keep-alive, JSON bodies) for AnalysisService"""
+
+    ROUTES = [
+        ('GET', re.compile(r'^/health$'), 'health'),
+        ('POST', re.compile(r'^/quizzes$'), 'post_quiz'),
+        ('POST', re.compile(r'^/submissions$'), 'post_submissions'),
+        ('GET', re.compile(r'^/students/(?P<user_id>[^/]+)/(?P<part>persona|recommendations|report)$'), 'get_student'),
+        ('POST', re.compile(r'^/quizzes/(?P<quiz_id>[^/]+)/score$'), 'post_score'),
+    ]
+
+    def __init__(self, service: AnalysisService):
+        self.service = service
+
+    async def health(self, body: Any) -> Any:
+        return {'status': 'ok', 'students': len(self.service.cohort.aggregates), 'quizzes': len(self.service.quizzes)}
+
+    async def post_quiz(self, body: Any) -> Any:
+        if not isinstance(body, dict):
+            raise ServiceError(400, "Expected a quiz object")
+        try:
+            index = self.service.add_quiz(body)
+        except (KeyError, TypeError, ValueError, AttributeError) as error:
+            raise ServiceError(400, f"Invalid quiz: {error}")
+        return {'quiz_id': index.quiz_id, 'questions': index.question_count}
+
+    async def post_submissions(self, body: Any) -> Any:
+        submissions = body if isinstance(body, list) else [body]
+        try:
+            users = {self.service.add_submission(submission) for submission in submissions}
+        except (KeyError, TypeError, ValueError, AttributeError) as error:
+            raise ServiceError(400, f"Invalid submission: {error}")
+        return {'accepted': len(submissions), 'students': len(users)}
+
+    async def get_student(self, body: Any, user_id: str, part: str) -> Any:
+        report = self.service.report(user_id)
+        return report if part == 'report' else report[part]
+
+    async def post_score(self, body: Any, quiz_id: str) -> Any:
+        quiz_id = _parse_id(quiz_id)
+        submissions = body if isinstance(body, list) else [body]
+        if not all(isinstance(submission, dict) for submission in submissions):
+            raise ServiceError(400, "Expected submission objects with a response_map")
+        results = await asyncio.gather(*(
+            self.service.score(quiz_id, submission.get('response_map') or {}) for submission in submissions
+        ))
+        return results if isinstance(body, list) else results[0]
+
+    async def dispatch(self, method: str, path: str, raw_body: bytes) -> Tuple[int, Any]:
+        path = path.split('?', 1)[0]
+        allowed = False
+        for route_method, pattern, handler in self.ROUTES:
+            match = pattern.match(path)
+            if not match:
+                continue
+            allowed = True
+            if route_method != method:
+                continue
+            try:
+                body = json.loads(raw_body) if raw_body else None
+            except ValueError as error:
+                return 400, {'error': f"Invalid JSON body: {error}"}
+            try:
+                return 200, await getattr(self, handler)(body, **match.groupdict())
+            except ServiceError as error:
+                return error.status, {'error': str(error)}
+            except Exception as error:
+                return 500, {'error': f"Internal error: {error}"}
+        if allowed:
+            return 405, {'error': f"{method} not allowed on {path}"}
+        return 404, {'error': f"No route for {path}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {'error': "Request body too large"}
+                    keep_alive = False
+                else:
+                    raw_body = await reader.readexactly(length) if length else b''
+                    status, payload = await self.dispatch(method, target, raw_body)
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8600) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+
+
+async def run_server(service: AnalysisService, host: str, port: int):
+    server = await AnalysisHTTPServer(service).serve(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Serve student analysis over a local HTTP API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--quiz', nargs='*', default=[], help="Quiz definition files to preload")
+    parser.add_argument('--historical', nargs='*', default=[], help="Submission exports to preload")
+    parser.add_argument('--snapshot', help="Cohort snapshot (from cohort_snapshot.py) to start from")
+    args = parser.parse_args(argv)
+
+    service = AnalysisService()
+    for path in args.quiz:
+        with open(path, 'rb') as fp:
+            service.add_quiz(json.load(fp))
+    if args.snapshot:
+        service.load_snapshot(args.snapshot)
+    service.load_history(*args.historical)
+    asyncio.run(run_server(service, args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,80 +1,38 @@
 import streamlit as st
+import hashlib
+import io
 import json
-from student_recommendations import StudentAnalyzer
+import os
+import tempfile
+import time
+from typing import Dict, Any, Set
+from uuid import uuid4
+import instrumentation
+from quiz_scoring import QuizScorer
+from quiz_cache import QuizCatalog
 
-def generate_strategies(data: dict) -> list:
-    """Generate improvement strategies based on student data"""
-    learning_style = data['persona']['learning_style']
-    performance_level = data['persona']['performance_level']
-    
-    # Pre-defined strategies based on learning style and performance level
-    strategies = {
-        "Fast and Accurate": [
-            "Challenge yourself with advanced problem sets in your weak areas",
-            "Create study materials to teach concepts to peers",
-            "Focus on time management to maintain high accuracy"
-        ],
-        "Quick but Needs More Practice": [
-            "Slow down and double-check your work before submitting",
-            "Practice with mixed difficulty questions to build confidence",
-            "Focus on understanding core concepts before moving to advanced topics"
-        ],
-        "Methodical and Accurate": [
-            "Gradually increase your speed while maintaining accuracy",
-            "Take timed practice tests to improve efficiency",
-            "Focus on pattern recognition in similar problems"
-        ],
-        "Building Foundations": [
-            "Start with basic concepts and gradually increase difficulty",
-            "Break down complex topics into smaller, manageable parts",
-            "Regular practice with immediate feedback"
-        ]
-    }
-    
-    # Get strategies based on learning style
-    base_strategies = strategies.get(learning_style, strategies["Building Foundations"])
-    
-    # Add performance-specific strategy
-    if performance_level == "High Achiever":
-        base_strategies.append("Focus on maintaining consistency while tackling more challenging content")
-    elif performance_level == "Average Performer":
-        base_strategies.append("Identify and focus on specific areas where improvement is needed")
-    else:
-        base_strategies.append("Build a strong foundation in core concepts through regular practice")
-    
-    return base_strategies[:3]  # Return top 3 strategies
-
-def generate_summary(data: dict) -> str:
-    """Generate a summary of student performance"""
-    learning_style = data['persona']['learning_style']
-    performance_level = data['persona']['performance_level']
-    strengths = ', '.join(data['persona']['strength_areas'])
-    weak_areas = ', '.join([area['topic'] for area in data['persona']['improvement_needed']])
-    consistency = data['persona']['consistency_score']
-    
-    summary = f"""
-    This student demonstrates a {learning_style.lower()} learning approach, performing at an {performance_level.lower()} level 
-    with a consistency score of {consistency}%. Their key strengths lie in {strengths}. 
-    However, they should focus on improving in {weak_areas}. 
-    
-    Based on their learning pattern, they would benefit from a structured approach that combines 
-    their quick learning ability with more thorough practice sessions. The student shows potential 
-    for improvement, particularly if they focus on building stronger foundations in their weak areas 
-    while maintaining their current strengths.
-    """
-    return summary.strip()
+# The analysis modules (and through them numpy and pandas) are imported inside analyze_uploads,
+# so the welcome screen renders without paying for them; see benchmarks/import_times.py
 
-def main():
-    # Set page config
-    st.set_page_config(
-        page_title="Student Performance Analysis",
-        page_icon="📊",
-        layout="wide",
-        initial_sidebar_state="expanded"
-    )
+@st.cache_resource
+def get_quiz_scorer() -> QuizScorer:
+    """Quiz scorer shared across sessions, backed by the on-disk quiz catalog"""
+    return QuizScorer(catalog=QuizCatalog())
+
+@st.cache_resource
+def timing_sessions() -> Set[str]:
+    """Sessions with the timing breakdown switched on; instrumentation patches the whole process"""
+    return set()
 
-    # Custom CSS
-    st.markdown("""
+@st.cache_resource
+def class_exports() -> Dict[str, Any]:
+    """Background class exports by historical-file hash, shared across reruns and sessions"""
+    return {}
+
+ANALYSIS_CACHE_ENTRIES = 128
+
+# Static page blocks rendered by main()
+CUSTOM_CSS = """
         <style>
         .main {
             padding: 0rem 1rem;
@@ -179,7 +137,138 @@ def main():
             line-height: 1.6;
         }
         </style>
-    """, unsafe_allow_html=True)
+    """
+
+WELCOME_HTML = """
+            <div style="text-align: center; padding: 2rem;">
+                <h2>👋 Welcome to Student Performance Analysis</h2>
+                <p style="font-size: 1.2rem;">Upload your JSON files in the sidebar to begin the analysis.</p>
+            </div>
+        """
+
+USAGE_TEXT = """
+                1. Upload your Historical Data JSON file
+                2. Upload your Current Quiz Data JSON file
+                3. Upload your Quiz Submission Data JSON file
+                4. Click 'Analyze Data' to see the results
+            """
+
+SAMPLE_FORMAT = """
+            Historical Data Format:
+            [{
+                "quiz": {"topic": "Mathematics", "difficulty": "Medium"},
+                "score": 75,
+                "accuracy": "80 %",
+                "correct_answers": 8,
+                "total_questions": 10
+            }]
+            """
+
+
+def content_key(*contents: bytes) -> str:
+    """Hash the uploaded files' contents into one cache key"""
+    digest = hashlib.sha256()
+    for content in contents:
+        digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+@st.cache_data(max_entries=ANALYSIS_CACHE_ENTRIES, show_spinner=False)
+def analyze_uploads(key: str, _historical: bytes, _current_quiz: bytes, _submission: bytes) -> Dict[str, Any]:
+    """Parse and analyze one set of uploads; memoized by content hash with LRU eviction"""
+    return run_analysis(_historical, _current_quiz, _submission)
+
+def run_analysis(historical: bytes, current_quiz: bytes, submission: bytes) -> Dict[str, Any]:
+    """Parse and analyze one set of uploads (uncached)"""
+    from question_difficulty import DifficultyCalibrator
+    from report_export import dumps
+    from reports import build_report
+    from student_recommendations import StudentAnalyzer
+    from submission_stream import iter_submissions
+
+    scorer = get_quiz_scorer()
+    historical_data = list(iter_submissions(io.BytesIO(historical)))
+    quiz_index = scorer.catalog.load(current_quiz)
+    scorer.add_index(quiz_index)
+    quiz_submission = json.loads(submission)
+
+    # Calibrate question difficulty from every uploaded attempt at the current quiz
+    difficulty = DifficultyCalibrator(scorer)
+    difficulty.extend(
+        (submission for submission in historical_data if submission.quiz_id == quiz_index.quiz_id),
+        quiz_index.summary()
+    )
+    difficulty.add_submission(quiz_submission, quiz_index.summary())
+
+    analyzer = StudentAnalyzer(scorer=scorer, difficulty=difficulty)
+    analyzer.load_data(historical_data, quiz_index.summary(), quiz_submission)
+    data = build_report(analyzer)
+    data['report'] = dumps({'persona': data['persona'], 'recommendations': data['recommendations']}, indent=True)
+    return data
+
+def set_debug_timings(enabled: bool):
+    """Instrument the analyzer while any session shows the timing breakdown"""
+    session = st.session_state.setdefault('timing_session', uuid4().hex)
+    sessions = timing_sessions()
+    if enabled:
+        sessions.add(session)
+        instrumentation.enable()
+    elif session in sessions:
+        sessions.discard(session)
+        if not sessions:
+            instrumentation.disable()
+
+def start_class_export(historical: bytes):
+    """Export reports for every student in the historical file from a background thread"""
+    from report_export import BackgroundExport
+    from submission_stream import load_cohort
+
+    key = content_key(historical)
+    exports = class_exports()
+    job = exports.get(key)
+    if job is not None and not job.done:
+        # Both jobs would write the same temporary file
+        return
+    path = os.path.join(tempfile.gettempdir(), f"class_reports_{key[:16]}.jsonl.gz")
+    exports[key] = BackgroundExport(lambda: load_cohort(io.BytesIO(historical)), path, workers=1)
+
+@st.fragment(run_every=1)
+def class_export_progress(key: str):
+    """Poll a running class export; reruns the page once it finishes, which stops the polling"""
+    job = class_exports()[key]
+    if job.done:
+        st.rerun()
+    total = job.total or 0
+    st.progress(job.written / total if total else 0.0, text=f"Exporting {job.written}/{total or '?'} students...")
+
+def class_export_status(key: str):
+    """Progress of a class export, then the file once it is written"""
+    job = class_exports().get(key)
+    if job is None:
+        return
+    if not job.done:
+        class_export_progress(key)
+    elif job.error is not None:
+        st.error(f"Class export failed: {job.error}")
+    else:
+        with open(job.path, 'rb') as fp:
+            st.download_button(
+                f"📦 Download Class Reports ({job.stats['students']})",
+                fp.read(),
+                "class_reports.jsonl.gz",
+                "application/gzip",
+                use_container_width=True
+            )
+
+def main():
+    # Set page config
+    st.set_page_config(
+        page_title="Student Performance Analysis",
+        page_icon="📊",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
     # Sidebar
     with st.sidebar:
@@ -192,22 +281,40 @@ def main():
             submission_file = st.file_uploader("📤 Quiz Submission Data", type=['json'], key="submission")
             submitted = st.form_submit_button("Analyze Data", type="primary")
 
+        debug_timings = st.checkbox("🐞 Show timing breakdown", key="debug_timings")
+        set_debug_timings(debug_timings)
+
+        if historical_file:
+            # Reports for every student in the historical file, built without blocking the page
+            export_key = content_key(historical_file.getvalue())
+            if st.button("📦 Export Class Reports", use_container_width=True):
+                start_class_export(historical_file.getvalue())
+            if export_key in class_exports():
+                class_export_status(export_key)
+
+    # Keep showing results on later reruns (expanders, downloads) instead of only right after submit
+    if submitted:
+        st.session_state['analysis_requested'] = True
+
     # Main content
     st.title("Student Performance Analysis Dashboard")
     st.markdown("---")
 
-    if all([historical_file, current_quiz_file, submission_file]) and submitted:
+    if all([historical_file, current_quiz_file, submission_file]) and st.session_state.get('analysis_requested'):
         try:
             with st.spinner("🔄 Processing data..."):
-                # Load and analyze data
-                historical_data = json.load(historical_file)
-                current_quiz = json.load(current_quiz_file)
-                quiz_submission = json.load(submission_file)
-
-                analyzer = StudentAnalyzer()
-                analyzer.load_data(historical_data, current_quiz, quiz_submission)
-                persona = analyzer.generate_student_persona()
-                recommendations = analyzer.generate_recommendations()
+                # Load and analyze data; reruns with the same files are served from the cache,
+                # except while timing, so the breakdown always measures a full analysis
+                started = time.perf_counter()
+                uploads = [historical_file.getvalue(), current_quiz_file.getvalue(), submission_file.getvalue()]
+                with instrumentation.capture() as timings:
+                    if debug_timings:
+                        analysis = run_analysis(*uploads)
+                    else:
+                        analysis = analyze_uploads(content_key(*uploads), *uploads)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                persona = analysis['persona']
+                recommendations = analysis['recommendations']
 
             # Tabs
             tabs = st.tabs(["📊 Overview", "👤 Student Profile", "📈 Performance Analysis"])
@@ -216,7 +323,7 @@ def main():
                 st.header("Quick Overview")
                 
                 # Summary section
-                summary = generate_summary({'persona': persona, 'recommendations': recommendations})
+                summary = analysis['summary']
                 st.markdown(f"""
                     <div class="summary-card">
                         <h3>📊 Performance Summary</h3>
@@ -287,17 +394,22 @@ def main():
                 st.subheader("📚 Personalized Practice Plan")
                 for plan in recommendations['suggested_practice_plan']:
                     with st.expander(f"📘 Plan for {plan['topic']}"):
+                        practice_questions = ''
+                        if plan.get('question_ids'):
+                            practice_questions = (f"<p>🧩 <b>Practice Questions ({plan['target_difficulty']}):</b> "
+                                                  f"{', '.join(map(str, plan['question_ids']))}</p>")
                         st.markdown(f"""
                             <div class="metric-card">
                                 <p>🎯 <b>Recommended Questions:</b> {plan['recommended_questions']}</p>
                                 <p>📋 <b>Focus Areas:</b> {', '.join(plan['focus_areas'])}</p>
                                 <p>⏱️ <b>Estimated Time:</b> {plan['estimated_time']}</p>
+                                {practice_questions}
                             </div>
                         """, unsafe_allow_html=True)
 
                 # Strategies
                 st.subheader("💡 Improvement Strategies")
-                strategies = generate_strategies({'persona': persona, 'recommendations': recommendations})
+                strategies = analysis['strategies']
                 for strategy in strategies:
                     st.markdown(f"""
                         <div class="success-card">
@@ -305,15 +417,19 @@ def main():
                         </div>
                     """, unsafe_allow_html=True)
 
+            if debug_timings:
+                with st.expander("🐞 Timing breakdown", expanded=True):
+                    st.markdown(f"**This request (uncached):** {elapsed_ms:.1f} ms")
+                    if timings:
+                        st.table([{'method': name, 'ms': round(seconds * 1000, 3)} for name, seconds in timings])
+                    st.markdown("**Since process start:**")
+                    st.table([{'method': name, **stats} for name, stats in instrumentation.snapshot().items()])
+
             # Download button
             st.sidebar.markdown("---")
-            results = {
-                "persona": persona,
-                "recommendations": recommendations
-            }
             st.sidebar.download_button(
                 "📥 Download Analysis Report",
-                json.dumps(results, indent=2),
+                analysis['report'],
                 "student_analysis.json",
                 "application/json",
                 use_container_width=True
@@ -325,32 +441,13 @@ def main():
     
     else:
         # Welcome screen
-        st.markdown("""
-            <div style="text-align: center; padding: 2rem;">
-                <h2>👋 Welcome to Student Performance Analysis</h2>
-                <p style="font-size: 1.2rem;">Upload your JSON files in the sidebar to begin the analysis.</p>
-            </div>
-        """, unsafe_allow_html=True)
+        st.markdown(WELCOME_HTML, unsafe_allow_html=True)
         
         with st.expander("ℹ️ How to Use"):
-            st.markdown("""
-                1. Upload your Historical Data JSON file
-                2. Upload your Current Quiz Data JSON file
-                3. Upload your Quiz Submission Data JSON file
-                4. Click 'Analyze Data' to see the results
-            """)
+            st.markdown(USAGE_TEXT)
             
         with st.expander("📋 Sample Data Format"):
-            st.code("""
-            Historical Data Format:
-            [{
-                "quiz": {"topic": "Mathematics", "difficulty": "Medium"},
-                "score": 75,
-                "accuracy": "80 %",
-                "correct_answers": 8,
-                "total_questions": 10
-            }]
-            """)
+            st.code(SAMPLE_FORMAT)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
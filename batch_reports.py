@@ -0,0 +1,228 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Set, Tuple
+
+from student_recommendations import StudentAnalyzer, normalize_submissions
+from peer_index import PercentileIndex
+from similar_students import SimilarStudentIndex
+from cohort_analysis import aggregate_by_user
+from submission_stream import iter_json_records, iter_submissions
+from quiz_scoring import QuizScorer
+from quiz_cache import QuizCatalog, DEFAULT_CATALOG_PATH
+from reports import build_report
+from worker_state import cohort_indexes, init_worker
+
+INPUT_EXTENSIONS = ('.json', '.jsonl')
+JSONL_REPORT_NAME = 'reports.jsonl'
+
+_worker_scorer: Optional[QuizScorer] = None
+
+
+def expand_paths(patterns: Iterable[str]) -> List[str]:
+    """Expand directories and glob patterns into a sorted list of input files"""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for name in os.listdir(pattern):
+                if name.endswith(INPUT_EXTENSIONS):
+                    paths.add(os.path.join(pattern, name))
+        else:
+            paths.update(glob.glob(pattern))
+    return sorted(paths)
+
+
+def load_histories(paths: Iterable[str]) -> Dict[str, List[Dict]]:
+    """Stream historical submission files into compact per-student histories"""
+    histories = defaultdict(list)
+    for path in paths:
+        for submission in iter_submissions(path, keep_responses=False):
+            histories[submission.user_id].append(submission)
+    return histories
+
+
+def load_latest_submissions(paths: Iterable[str]) -> Dict[str, Dict]:
+    """Index current quiz submissions by user_id, keeping each student's most recent one"""
+    latest = {}
+    for path in paths:
+        with open(path, 'rb') as fp:
+            for submission in iter_json_records(fp):
+                user_id = submission.get('user_id')
+                previous = latest.get(user_id)
+                if previous is None or (submission.get('submitted_at') or '') >= (previous.get('submitted_at') or ''):
+                    latest[user_id] = submission
+    return latest
+
+
+def load_quizzes(paths: Iterable[str], catalog: QuizCatalog) -> Dict[Any, Dict]:
+    """Register current quiz definitions in the catalog and return their summaries by quiz id"""
+    quizzes = {}
+    for path in paths:
+        with open(path, 'rb') as fp:
+            index = catalog.load(fp.read())
+        quizzes[index.quiz_id] = index.summary()
+    return quizzes
+
+
+def _init_worker(catalog_path: str, peers: PercentileIndex = None, similar: SimilarStudentIndex = None):
+    global _worker_scorer
+    _worker_scorer = QuizScorer(catalog=QuizCatalog(catalog_path))
+    init_worker(peers, similar)
+
+
+def analyze_student(task: Tuple[str, List[Dict], Optional[Dict], Optional[Dict]]) -> Dict[str, Any]:
+    """Build one student's report; runs inside a worker process"""
+    user_id, history, current_quiz, submission = task
+    peers, similar = cohort_indexes()
+    analyzer = StudentAnalyzer(scorer=_worker_scorer, peers=peers, similar=similar)
+    analyzer.load_data(history, current_quiz, submission)
+    report = build_report(analyzer)
+    return {'user_id': user_id, **report}
+
+
+class ReportWriter:
+    """Write reports as one JSON file per student or as a single JSON-lines file, supporting resume"""
+
+    def __init__(self, output_dir: str, output_format: str = 'json'):
+        self.output_dir = output_dir
+        self.output_format = output_format
+        os.makedirs(output_dir, exist_ok=True)
+        self._jsonl = None
+
+    @property
+    def jsonl_path(self) -> str:
+        return os.path.join(self.output_dir, JSONL_REPORT_NAME)
+
+    def report_path(self, user_id: str) -> str:
+        return os.path.join(self.output_dir, f"{user_id}.json")
+
+    def completed(self) -> Set[str]:
+        """User ids whose reports were fully written by a previous run"""
+        if self.output_format == 'json':
+            return {
+                name[:-len('.json')] for name in os.listdir(self.output_dir)
+                if name.endswith('.json')
+            }
+        done = set()
+        if os.path.exists(self.jsonl_path):
+            with open(self.jsonl_path, encoding='utf-8') as fp:
+                for line in fp:
+                    try:
+                        done.add(json.loads(line)['user_id'])
+                    except (ValueError, KeyError):
+                        # Partially written line from an interrupted run
+                        continue
+        return done
+
+    def write(self, report: Dict[str, Any]):
+        if self.output_format == 'json':
+            path = self.report_path(report['user_id'])
+            # Write then rename so an interrupted run never leaves a truncated report behind
+            with open(path + '.tmp', 'w', encoding='utf-8') as fp:
+                json.dump(report, fp, indent=2)
+            os.replace(path + '.tmp', path)
+            return
+        if self._jsonl is None:
+            truncated = self._ends_mid_line()
+            self._jsonl = open(self.jsonl_path, 'a', encoding='utf-8')
+            if truncated:
+                # Terminate a line cut short by an interrupted run
+                self._jsonl.write('\n')
+        self._jsonl.write(json.dumps(report) + '\n')
+        self._jsonl.flush()
+
+    def _ends_mid_line(self) -> bool:
+        if not os.path.exists(self.jsonl_path) or not os.path.getsize(self.jsonl_path):
+            return False
+        with open(self.jsonl_path, 'rb') as fp:
+            fp.seek(-1, os.SEEK_END)
+            return fp.read(1) != b'\n'
+
+    def close(self):
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+def iter_tasks(histories: Dict[str, List[Dict]], submissions: Dict[str, Dict], quizzes: Dict[Any, Dict],
+               skip: Set[str]) -> Iterator[Tuple[str, List[Dict], Optional[Dict], Optional[Dict]]]:
+    for user_id, history in histories.items():
+        if user_id in skip:
+            continue
+        submission = submissions.get(user_id)
+        current_quiz = quizzes.get(submission.get('quiz_id')) if submission else None
+        yield user_id, history, current_quiz, (submission if current_quiz else None)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    started = time.perf_counter()
+    catalog = QuizCatalog(args.quiz_catalog)
+    quizzes = load_quizzes(expand_paths(args.current_quiz), catalog)
+    catalog.close()
+    submissions = load_latest_submissions(expand_paths(args.submission))
+    histories = load_histories(expand_paths(args.historical))
+    frame = normalize_submissions(list(chain.from_iterable(histories.values())))
+    peers = PercentileIndex.from_frame(frame)
+    similar = SimilarStudentIndex.build(aggregate_by_user(frame))
+    del frame
+
+    writer = ReportWriter(args.output, args.format)
+    skip = writer.completed() if args.resume else set()
+    tasks = iter_tasks(histories, submissions, quizzes, skip)
+
+    written = 0
+    try:
+        if args.workers == 1:
+            _init_worker(args.quiz_catalog, peers, similar)
+            reports = map(analyze_student, tasks)
+            for report in reports:
+                writer.write(report)
+                written += 1
+        else:
+            with ProcessPoolExecutor(args.workers, initializer=_init_worker,
+                                     initargs=(args.quiz_catalog, peers, similar)) as pool:
+                for report in pool.map(analyze_student, tasks, chunksize=args.chunk_size):
+                    writer.write(report)
+                    written += 1
+    finally:
+        writer.close()
+
+    return {
+        'students': len(histories),
+        'written': written,
+        'skipped': len(skip & set(histories)),
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate student analysis reports in bulk without the dashboard")
+    parser.add_argument('--historical', nargs='+', required=True,
+                        help="Historical submission files, directories or glob patterns")
+    parser.add_argument('--current-quiz', nargs='*', default=[],
+                        help="Current quiz definition files, directories or glob patterns")
+    parser.add_argument('--submission', nargs='*', default=[],
+                        help="Current quiz submission files, directories or glob patterns")
+    parser.add_argument('--output', required=True, help="Directory the reports are written to")
+    parser.add_argument('--format', choices=['json', 'jsonl'], default='json',
+                        help="One JSON file per student, or a single reports.jsonl")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument('--chunk-size', type=int, default=64, help="Students sent to a worker at a time")
+    parser.add_argument('--resume', action='store_true', help="Skip students whose reports already exist")
+    parser.add_argument('--quiz-catalog', default=DEFAULT_CATALOG_PATH, help="Path of the quiz catalog cache")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None):
+    stats = run(parse_args(argv))
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
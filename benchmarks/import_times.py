@@ -0,0 +1,95 @@
+"""Cold-start import cost of the dashboard and the analysis modules it loads on demand
+
+Each module is imported in a fresh interpreter with -X importtime. The report lists the total,
+the packages that dominate it and whether the heavy dependencies were pulled in. Exits with
+status 1 when a module exceeds its budget, so it can guard cold start in CI.
+
+Run from the repository root:
+
+    python -m benchmarks.import_times --budget-ms app=450
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Any, Tuple
+
+DEFAULT_MODULES = ['app', 'student_recommendations', 'cohort_analysis']
+HEAVY_PACKAGES = ('pandas', 'numpy', 'pyarrow')
+
+
+def import_profile(module: str) -> List[Tuple[str, int, int]]:
+    """(module, self microseconds, cumulative microseconds) for every import made by importing module"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=root, capture_output=True, text=True, check=True
+    )
+    profile = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        profile.append((name.strip(), int(self_us), int(cumulative_us)))
+    return profile
+
+
+def summarize(module: str, top: int) -> Dict[str, Any]:
+    profile = import_profile(module)
+    packages: Dict[str, int] = {}
+    for name, self_us, _ in profile:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    loaded = {name.split('.')[0] for name, _, _ in profile}
+    return {
+        'module': module,
+        'total_ms': round(sum(self_us for _, self_us, _ in profile) / 1000, 1),
+        'heavy_imports': [package for package in HEAVY_PACKAGES if package in loaded],
+        'packages': [
+            {'package': package, 'ms': round(self_us / 1000, 1)}
+            for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        ],
+    }
+
+
+def parse_budgets(values: List[str]) -> Dict[str, float]:
+    budgets = {}
+    for value in values or []:
+        module, _, milliseconds = value.rpartition('=')
+        budgets[module or 'app'] = float(milliseconds)
+    return budgets
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Report cold-start import time per module")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--top', type=int, default=8, help="Packages to list per module")
+    parser.add_argument('--budget-ms', action='append', metavar='[MODULE=]MS',
+                        help="Fail if the module (default app) imports slower than this (repeatable)")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    budgets = parse_budgets(args.budget_ms)
+    results = [summarize(module, args.top) for module in dict.fromkeys(args.modules + list(budgets))]
+    over_budget = [result['module'] for result in results
+                   if result['module'] in budgets and result['total_ms'] > budgets[result['module']]]
+
+    if args.json:
+        print(json.dumps({'results': results, 'over_budget': over_budget}, indent=2))
+    else:
+        for result in results:
+            budget = budgets.get(result['module'])
+            print(f"{result['module']}: {result['total_ms']} ms"
+                  + (f" (budget {budget:g} ms)" if budget is not None else "")
+                  + f", heavy imports: {', '.join(result['heavy_imports']) or 'none'}")
+            for package in result['packages']:
+                print(f"    {package['package']:<28}{package['ms']:>10}")
+        if over_budget:
+            print(f"Over budget: {', '.join(over_budget)}")
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
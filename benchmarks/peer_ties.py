@@ -0,0 +1,60 @@
+"""Self-tie check of the per-topic peer percentiles
+
+A student with a single attempt in a topic is ranked against a group that holds that same
+attempt, so their correct_rate must be found in the group as an exact tie. A value that is one
+floating-point step off ranks at the 0th or 100th percentile instead and flips weak-area and
+strength decisions. Checks the synthetic cohort and, if given, real exports; exits with status 1
+on any miss, so it can guard the index in CI.
+
+Run from the repository root:
+
+    python -m benchmarks.peer_ties --historical data/XgAgFJ.json
+"""
+import argparse
+import json
+import sys
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Any, Iterable, Union
+
+from cohort_analysis import CohortAnalyzer
+from peer_index import correct_rate
+from records import SubmissionRecord
+from submission_stream import iter_submissions
+
+from benchmarks.synthetic_data import generate_quizzes, generate_submissions
+
+
+def self_ties(submissions: Iterable[Union[Dict, SubmissionRecord]]) -> Dict[str, int]:
+    """Single-attempt topics checked, and how many of them missed their own value in the peer group"""
+    cohort = CohortAnalyzer()
+    cohort.load_data(submissions)
+    checked = missed = 0
+    for aggregates in cohort.aggregates.values():
+        for topic, scores in aggregates.topic_scores.items():
+            if len(scores) != 1:
+                continue
+            rate = correct_rate(aggregates.topic_correct[topic], aggregates.topic_total[topic])
+            values = cohort.peers.groups[('topic', topic)]['correct_rate'].to_numpy()
+            checked += 1
+            missed += bisect_right(values, rate) == bisect_left(values, rate)
+    return {'checked': checked, 'missed': missed}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Check that single-attempt topics tie with themselves in the peer index")
+    parser.add_argument('--historical', nargs='*', default=[], help="Submission exports (JSON array or JSON lines)")
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    quizzes = generate_quizzes(20, 8, 15, seed=args.seed)
+    results: Dict[str, Any] = {'synthetic': self_ties(generate_submissions(args.students, 6, quizzes, seed=args.seed))}
+    for path in args.historical:
+        results[path] = self_ties(iter_submissions(path))
+    print(json.dumps(results, indent=2))
+    if any(result['missed'] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
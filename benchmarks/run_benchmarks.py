@@ -0,0 +1,145 @@
+"""Timed scenarios for the analysis pipeline over synthetic data
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --students 2000 --attempts 50 --questions 100 --topics 15
+"""
+import argparse
+import gc
+import io
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Any
+
+from student_recommendations import StudentAnalyzer
+from cohort_analysis import CohortAnalyzer
+from quiz_scoring import QuizScorer
+from question_difficulty import DifficultyCalibrator
+from similar_students import SimilarStudentIndex
+from submission_stream import load_cohort
+from reports import generate_strategies, generate_summary, build_report
+from benchmarks.synthetic_data import generate_quizzes, generate_submissions
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Median and best wall time over repeat runs, plus peak traced memory of one extra run"""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'best_ms': round(min(timings) * 1000, 3),
+        'peak_kib': round(peak / 1024, 1)
+    }
+
+
+def build_scenarios(args: argparse.Namespace) -> Dict[str, Callable[[], Any]]:
+    quizzes = generate_quizzes(args.quizzes, args.topics, args.questions, seed=args.seed)
+    quizzes_by_id = {quiz['quiz']['id']: quiz for quiz in quizzes}
+    submissions = generate_submissions(args.students, args.attempts, quizzes, seed=args.seed)
+
+    # Single-student scenarios use the first student's history and its last attempt as the current quiz
+    history = submissions[:args.attempts - 1]
+    current_submission = submissions[args.attempts - 1]
+    current_quiz = quizzes_by_id[current_submission['quiz_id']]
+
+    loaded = StudentAnalyzer()
+    loaded.load_data(history, current_quiz, current_submission)
+    report = build_report(loaded)
+    export = '\n'.join(json.dumps(submission) for submission in submissions)
+    scorer = QuizScorer()
+
+    def load():
+        StudentAnalyzer().load_data(history, current_quiz, current_submission)
+
+    def cohort():
+        analyzer = CohortAnalyzer()
+        analyzer.load_data(submissions)
+        analyzer.analyze()
+
+    def stream():
+        load_cohort(io.StringIO(export)).analyze()
+
+    def score():
+        for submission in submissions:
+            scorer.score(submission, quizzes_by_id[submission['quiz_id']])
+
+    cohort_aggregates = CohortAnalyzer()
+    cohort_aggregates.load_data(submissions)
+
+    def similar():
+        index = SimilarStudentIndex.build(cohort_aggregates.aggregates)
+        for user_id, aggregates in cohort_aggregates.aggregates.items():
+            index.recommend(aggregates, user_id)
+
+    def calibrate():
+        calibrator = DifficultyCalibrator(scorer)
+        for submission in submissions:
+            calibrator.add_submission(submission, quizzes_by_id[submission['quiz_id']])
+        calibrator.calibrate()
+
+    return {
+        'load_data': load,
+        'generate_student_persona': loaded.generate_student_persona,
+        'generate_recommendations': loaded.generate_recommendations,
+        'generate_strategies': lambda: generate_strategies(report),
+        'generate_summary': lambda: generate_summary(report),
+        'build_report': lambda: build_report(loaded),
+        'cohort_analysis': cohort,
+        'streaming_cohort_load': stream,
+        'score_all_submissions': score,
+        'calibrate_difficulty': calibrate,
+        'similar_students': similar,
+    }
+
+
+def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    scenarios = build_scenarios(args)
+    selected = args.scenario or list(scenarios)
+    results = []
+    for name in selected:
+        results.append({'scenario': name, **measure(scenarios[name], args.repeat)})
+    return results
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the student analysis pipeline on synthetic data")
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--attempts', type=int, default=20, help="Submissions per student")
+    parser.add_argument('--questions', type=int, default=100, help="Questions per quiz")
+    parser.add_argument('--topics', type=int, default=10)
+    parser.add_argument('--quizzes', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scenario', action='append', help="Only run the named scenario (repeatable)")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args(argv)
+    if args.attempts < 2:
+        parser.error("--attempts must be at least 2")
+    return args
+
+
+def main(argv: List[str] = None):
+    args = parse_args(argv)
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<28}{'median ms':>12}{'best ms':>12}{'peak KiB':>12}")
+    for result in results:
+        print(f"{result['scenario']:<28}{result['median_ms']:>12}{result['best_ms']:>12}{result['peak_kib']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Synthetic quizzes and submissions with the same schema as the sample exports in data/"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Any
+
+TIMEZONE_SUFFIX = '+05:30'
+BASE_TIME = datetime(2025, 1, 1, 9, 0, 0)
+TOPIC_NAMES = [
+    'Body Fluids and Circulation', 'Human Reproduction', 'Reproductive Health', 'Respiration and Gas Exchange',
+    'Principles of Inheritance and Variation', 'Human Health and Disease', 'Microbes in Human Welfare',
+    'Structural Organisation in Animals', 'Cell Structure and Function', 'Plant Kingdom', 'Animal Kingdom',
+    'Biomolecules', 'Neural Control and Coordination', 'Chemical Coordination', 'Excretory Products',
+]
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + f"{moment.microsecond // 1000:03d}" + TIMEZONE_SUFFIX
+
+
+def topic_names(count: int) -> List[str]:
+    """Return count distinct topic names, reusing the real ones first"""
+    names = TOPIC_NAMES[:count]
+    names.extend(f"Synthetic Topic {index}" for index in range(len(names), count))
+    return names
+
+
+def generate_quiz(quiz_id: int, topic: str, n_questions: int, rng: random.Random,
+                  first_question_id: int = None, options_per_question: int = 4) -> Dict[str, Any]:
+    """Generate a current-quiz payload like data/LLQT.json, wrapped as {"quiz": {...}}"""
+    created = _timestamp(BASE_TIME - timedelta(days=200 - quiz_id % 100))
+    first_question_id = first_question_id if first_question_id is not None else quiz_id * 1000
+    questions = []
+    for offset in range(n_questions):
+        question_id = first_question_id + offset
+        correct = rng.randrange(options_per_question)
+        questions.append({
+            'id': question_id,
+            'description': f"Synthetic question {question_id} about {topic.lower()}?",
+            'difficulty_level': None,
+            'created_at': created,
+            'updated_at': created,
+            'topic': topic.lower() + ' ',
+            'is_published': True,
+            'is_mandatory': False,
+            'detailed_solution': "**Explanation:**\n\n" + "Synthetic worked solution text. " * 20,
+            'type': '',
+            'is_saved': False,
+            'tag': '',
+            'topic_id': 100 + TOPIC_NAMES.index(topic) if topic in TOPIC_NAMES else None,
+            'reading_material_id': None,
+            'photo_url': None,
+            'photo_solution_url': None,
+            'pyq_label': None,
+            'question_from': 'Q-bank',
+            'language': None,
+            'quiz_level': None,
+            'options': [
+                {
+                    'id': question_id * options_per_question + index,
+                    'description': f"Option {index + 1}",
+                    'question_id': question_id,
+                    'is_correct': index == correct,
+                    'created_at': created,
+                    'updated_at': created,
+                    'unanswered': False,
+                    'photo_url': None
+                }
+                for index in range(options_per_question)
+            ]
+        })
+    return {'quiz': {**quiz_header(quiz_id, topic, n_questions), 'questions': questions}}
+
+
+def quiz_header(quiz_id: int, topic: str, n_questions: int) -> Dict[str, Any]:
+    """Quiz metadata as embedded in every submission record"""
+    created = _timestamp(BASE_TIME - timedelta(days=200 - quiz_id % 100))
+    return {
+        'id': quiz_id, 'name': None, 'title': f"{topic} ({quiz_id})", 'description': '',
+        'difficulty_level': None, 'topic': topic, 'time': created, 'is_published': True,
+        'created_at': created, 'updated_at': created, 'duration': n_questions, 'end_time': created,
+        'negative_marks': '1.0', 'correct_answer_marks': '4.0', 'shuffle': True, 'show_answers': True,
+        'lock_solutions': False, 'is_form': False, 'show_mastery_option': False, 'reading_material': None,
+        'quiz_type': None, 'is_custom': False, 'banner_id': None, 'exam_id': None, 'show_unanswered': False,
+        'ends_at': '2025-12-31', 'lives': None, 'live_count': 'Free Test', 'coin_count': -1,
+        'questions_count': n_questions, 'daily_date': 'January 1, 2025', 'max_mistake_count': 15,
+        'reading_materials': []
+    }
+
+
+def generate_quizzes(n_quizzes: int, n_topics: int, n_questions: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    topics = topic_names(n_topics)
+    return [generate_quiz(quiz_id, topics[quiz_id % n_topics], n_questions, rng) for quiz_id in range(1, n_quizzes + 1)]
+
+
+def generate_submission(submission_id: int, user_id: str, quiz: Dict[str, Any], ability: float,
+                        submitted: datetime, rng: random.Random) -> Dict[str, Any]:
+    """Generate one submission record like the entries of data/XgAgFJ.json"""
+    quiz = quiz['quiz']
+    questions = quiz['questions']
+    answered = rng.sample(questions, rng.randint(max(1, len(questions) // 10), len(questions)))
+    response_map = {}
+    correct = 0
+    for question in answered:
+        options = question['options']
+        if rng.random() < ability:
+            choice = next(option for option in options if option['is_correct'])
+            correct += 1
+        else:
+            choice = rng.choice(options)
+            correct += choice['is_correct']
+        response_map[str(question['id'])] = choice['id']
+
+    incorrect = len(answered) - correct
+    score = correct * 4 - incorrect
+    started = submitted - timedelta(minutes=rng.randint(5, 30))
+    return {
+        'id': submission_id, 'quiz_id': quiz['id'], 'user_id': user_id,
+        'submitted_at': _timestamp(submitted), 'created_at': _timestamp(submitted),
+        'updated_at': _timestamp(submitted), 'score': score, 'trophy_level': rng.randint(1, 3),
+        'accuracy': f"{round(100 * correct / len(answered))} %", 'speed': str(rng.choice([60, 80, 90, 100])),
+        'final_score': f"{float(score - incorrect)}", 'negative_score': f"{float(incorrect)}",
+        'correct_answers': correct, 'incorrect_answers': incorrect, 'source': 'exam', 'type': 'topic',
+        'started_at': _timestamp(started), 'ended_at': _timestamp(submitted), 'duration': '15:00',
+        'better_than': rng.randint(0, 500), 'total_questions': len(questions),
+        'rank_text': f"Topic Rank - #{rng.randint(1, 5000)}", 'mistakes_corrected': rng.randint(0, incorrect),
+        'initial_mistake_count': incorrect, 'response_map': response_map,
+        'quiz': quiz_header(quiz['id'], quiz['topic'], len(questions))
+    }
+
+
+def generate_submissions(n_students: int, attempts_per_student: int, quizzes: List[Dict[str, Any]],
+                         seed: int = 0) -> List[Dict[str, Any]]:
+    """Generate a flat cohort export: attempts_per_student submissions for each of n_students"""
+    rng = random.Random(seed)
+    submissions = []
+    for student in range(n_students):
+        user_id = f"synthetic-user-{student:06d}"
+        ability = rng.uniform(0.2, 0.95)
+        moment = BASE_TIME
+        for _ in range(attempts_per_student):
+            moment += timedelta(hours=rng.randint(1, 72))
+            quiz = rng.choice(quizzes)
+            submissions.append(generate_submission(len(submissions) + 1, user_id, quiz, ability, moment, rng))
+    return submissions
@@ -0,0 +1,155 @@
+from typing import Dict, List, Any, Iterable, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from student_recommendations import StudentAnalyzer, PerformanceAggregates, normalize_submissions, recency_weights
+from peer_index import PercentileIndex
+from similar_students import SimilarStudentIndex
+from records import SubmissionRecord, as_submission_record
+from topic_taxonomy import default_taxonomy
+
+
+def _factorize(values: pd.Series) -> Tuple[np.ndarray, List]:
+    """Encode values as integer codes in order of first appearance; missing values get a code too"""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return codes, [None if pd.isna(value) else value for value in uniques]
+
+
+def _split_by_code(values: np.ndarray, codes: np.ndarray, counts: np.ndarray) -> List[np.ndarray]:
+    """Split values into one array per group code, keeping the original order inside each group"""
+    order = np.argsort(codes, kind='stable')
+    return np.split(values[order], np.cumsum(counts)[:-1])
+
+
+def aggregate_by_user(frame: pd.DataFrame) -> Dict[str, PerformanceAggregates]:
+    """Compute PerformanceAggregates for every user in a normalized (chronologically sorted) submission table"""
+    if frame.empty:
+        return {}
+
+    user_codes, user_ids = _factorize(frame['user_id'])
+    n_users = len(user_ids)
+    counts = np.bincount(user_codes, minlength=n_users)
+
+    scores = frame['score'].to_numpy(dtype=np.float64)
+    accuracy = frame['accuracy'].to_numpy()
+    score_sum = np.bincount(user_codes, weights=scores, minlength=n_users)
+    deviations = scores - (score_sum / counts)[user_codes]
+    score_m2 = np.bincount(user_codes, weights=deviations ** 2, minlength=n_users)
+    speed_sum = np.bincount(user_codes, weights=frame['speed'].to_numpy(), minlength=n_users)
+    accuracy_sum = np.bincount(user_codes, weights=accuracy, minlength=n_users)
+    accuracy_trends = _split_by_code(accuracy, user_codes, counts)
+    submitted_at = frame['submitted_at'].to_numpy()
+    attempt_times = _split_by_code(submitted_at, user_codes, counts)
+
+    cohort = []
+    for index in range(n_users):
+        aggregates = PerformanceAggregates()
+        aggregates.count = int(counts[index])
+        aggregates.score_sum = float(score_sum[index])
+        aggregates.score_m2 = float(score_m2[index])
+        aggregates.speed_sum = float(speed_sum[index])
+        aggregates.accuracy_sum = float(accuracy_sum[index])
+        aggregates.accuracy_trend = accuracy_trends[index].tolist()
+        aggregates.attempt_times = attempt_times[index].tolist()
+        aggregates.accuracy_prefix = [0.0] + np.cumsum(accuracy_trends[index]).tolist()
+        cohort.append(aggregates)
+
+    # One group per (user, topic) pair, numbered in order of first appearance
+    # Topic ids come from the taxonomy; shift by one so a missing topic (-1) gets a code too
+    topic_codes = frame['topic_id'].to_numpy() + 1
+    n_topics = len(default_taxonomy) + 1
+    pair_codes, pair_keys = pd.factorize(user_codes.astype(np.int64) * n_topics + topic_codes)
+    n_pairs = len(pair_keys)
+    pair_counts = np.bincount(pair_codes, minlength=n_pairs)
+    correct = frame['correct_answers'].to_numpy()
+    total = frame['total_questions'].to_numpy()
+    pair_correct = np.bincount(pair_codes, weights=correct, minlength=n_pairs)
+    pair_total = np.bincount(pair_codes, weights=total, minlength=n_pairs)
+    weights = recency_weights(submitted_at)
+    pair_weighted_correct = np.bincount(pair_codes, weights=weights * correct, minlength=n_pairs)
+    pair_weighted_total = np.bincount(pair_codes, weights=weights * total, minlength=n_pairs)
+    pair_scores = _split_by_code(frame['score'].to_numpy(), pair_codes, pair_counts)
+    pair_times = _split_by_code(submitted_at, pair_codes, pair_counts)
+
+    for index, key in enumerate(pair_keys):
+        aggregates = cohort[key // n_topics]
+        topic = default_taxonomy.name(key % n_topics - 1)
+        aggregates.topic_correct[topic] = int(pair_correct[index])
+        aggregates.topic_total[topic] = int(pair_total[index])
+        aggregates.topic_scores[topic] = pair_scores[index].tolist()
+        aggregates.topic_times[topic] = pair_times[index].tolist()
+        aggregates.topic_weighted_correct[topic] = float(pair_weighted_correct[index])
+        aggregates.topic_weighted_total[topic] = float(pair_weighted_total[index])
+
+    return dict(zip(user_ids, cohort))
+
+
+class CohortAnalyzer:
+    """Persona and recommendation analysis for many students at once"""
+
+    def __init__(self):
+        self.submissions = None
+        self.aggregates: Dict[str, PerformanceAggregates] = {}
+        self.peers = PercentileIndex()
+        self.difficulty = None
+        self._similar = None
+
+    def load_data(self, submissions: Iterable[Union[Dict, SubmissionRecord]]):
+        """Load a flat collection of submission records for any number of students"""
+        self.submissions = normalize_submissions(list(submissions))
+        self.aggregates = aggregate_by_user(self.submissions)
+        self.peers = PercentileIndex.from_frame(self.submissions)
+        self._similar = None
+
+    def load_aggregates(self, aggregates: Dict[str, PerformanceAggregates], peers: PercentileIndex = None):
+        """Load per-student aggregates (and optionally the peer index) computed elsewhere, e.g. by a streaming loader"""
+        self.submissions = None
+        self.aggregates = aggregates
+        self.peers = peers if peers is not None else PercentileIndex()
+        self._similar = None
+
+    @property
+    def user_ids(self) -> List[str]:
+        return list(self.aggregates)
+
+    @property
+    def similar(self) -> SimilarStudentIndex:
+        """Nearest-neighbour index over the cohort, built on first use and updated on add_submission"""
+        if self._similar is None:
+            self._similar = SimilarStudentIndex.build(self.aggregates)
+        return self._similar
+
+    @similar.setter
+    def similar(self, index: SimilarStudentIndex):
+        self._similar = index
+
+    def analyzer_for(self, user_id: str) -> StudentAnalyzer:
+        """Return a StudentAnalyzer backed by the cohort aggregates of one student"""
+        analyzer = StudentAnalyzer(peers=self.peers, difficulty=self.difficulty, similar=self.similar)
+        analyzer.load_aggregates(self.aggregates[user_id], user_id=user_id)
+        return analyzer
+
+    def add_submission(self, submission: Union[Dict, SubmissionRecord]) -> Dict[str, Any]:
+        """Apply one new submission to its student's aggregates and return the updated persona"""
+        submission = as_submission_record(submission, keep_responses=False)
+        user_id = submission.user_id
+        self.aggregates.setdefault(user_id, PerformanceAggregates()).add(submission)
+        self.peers.add(submission)
+        if self._similar is not None:
+            self._similar.upsert(user_id, self.aggregates[user_id])
+        return self.analyzer_for(user_id).generate_student_persona()
+
+    def analyze_student(self, user_id: str) -> Dict[str, Any]:
+        """Generate persona and recommendations for a single student"""
+        analyzer = self.analyzer_for(user_id)
+        return {
+            'persona': analyzer.generate_student_persona(),
+            'recommendations': analyzer.generate_recommendations()
+        }
+
+    def analyze(self, user_ids: Iterable[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Generate persona and recommendations for every student, keyed by user_id"""
+        if user_ids is None:
+            user_ids = self.user_ids
+        return {user_id: self.analyze_student(user_id) for user_id in user_ids}
@@ -0,0 +1,327 @@
+"""Columnar binary snapshots of cohort aggregates that open by memory-mapping
+
+A snapshot is a directory of .npy columns plus a small meta.json. Readers memory-map the
+columns read-only, so opening costs the same for any cohort size, every worker process shares
+the page cache instead of holding its own copy, and a student's PerformanceAggregates are only
+built when that student is looked up. The similar-student vectors and topic improvements are
+stored too, so the nearest-neighbour index opens from the mapped columns without building every
+student. User ids are stored as strings.
+
+    python cohort_snapshot.py --historical data/XgAgFJ.json --output snapshots/latest
+"""
+import argparse
+import json
+import os
+import shutil
+from collections.abc import MutableMapping, MutableSequence
+from typing import Dict, List, Any, Iterator, Optional
+
+import numpy as np
+
+from cohort_analysis import CohortAnalyzer
+from peer_index import PercentileIndex, SortedValues, METRICS
+from similar_students import SimilarStudentIndex, topic_improvements
+from student_recommendations import PerformanceAggregates
+from submission_stream import load_cohort
+from topic_taxonomy import default_taxonomy
+
+SNAPSHOT_VERSION = 1
+META_FILE = 'meta.json'
+STUDENT_COLUMNS = ['count', 'score_sum', 'score_m2', 'speed_sum', 'accuracy_sum']
+
+
+def _offsets(lengths: List[int]) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _concatenate(parts: List[List], dtype) -> np.ndarray:
+    return np.fromiter((value for part in parts for value in part), dtype=dtype, count=sum(map(len, parts)))
+
+
+def write_snapshot(path: str, aggregates: Dict[Any, PerformanceAggregates], peers: PercentileIndex = None):
+    """Write per-student aggregates (and optionally the peer index) to a snapshot directory
+
+    The snapshot is written next to path and swapped in afterwards, so readers never see a
+    partially written snapshot.
+    """
+    user_ids = list(aggregates)
+    encoded = [str(user_id).encode('utf-8') for user_id in user_ids]
+    # Rows are sorted by encoded user id for binary-search lookups; 'order' keeps the original order
+    rows = sorted(range(len(user_ids)), key=encoded.__getitem__)
+    students = [aggregates[user_ids[row]] for row in rows]
+    topics: Dict[str, int] = {}
+    for student in students:
+        for topic in student.topic_total:
+            topics.setdefault(topic, len(topics))
+    pairs = [(student, topic) for student in students for topic in student.topic_total]
+
+    columns = {
+        'user_ids': np.array([encoded[row] for row in rows], dtype=f'S{max(map(len, encoded), default=1)}'),
+        'order': np.argsort(np.asarray(rows, dtype=np.int64), kind='stable'),
+        'count': np.fromiter((student.count for student in students), dtype=np.int64, count=len(students)),
+        'attempt_offsets': _offsets([len(student.accuracy_trend) for student in students]),
+        'attempt_times': _concatenate([student.attempt_times for student in students], np.float64),
+        'attempt_accuracy': _concatenate([student.accuracy_trend for student in students], np.float64),
+        'topic_offsets': _offsets([len(student.topic_total) for student in students]),
+        'topic_codes': np.fromiter((topics[topic] for _, topic in pairs), dtype=np.int32, count=len(pairs)),
+        'topic_correct': np.fromiter((s.topic_correct[t] for s, t in pairs), dtype=np.int64, count=len(pairs)),
+        'topic_total': np.fromiter((s.topic_total[t] for s, t in pairs), dtype=np.int64, count=len(pairs)),
+        'topic_weighted_correct': np.fromiter((s.topic_weighted_correct.get(t, 0.0) for s, t in pairs),
+                                              dtype=np.float64, count=len(pairs)),
+        'topic_weighted_total': np.fromiter((s.topic_weighted_total.get(t, 0.0) for s, t in pairs),
+                                            dtype=np.float64, count=len(pairs)),
+        'topic_score_offsets': _offsets([len(s.topic_scores[t]) for s, t in pairs]),
+        'topic_times': _concatenate([s.topic_times[t] for s, t in pairs], np.float64),
+        'topic_scores': _concatenate([s.topic_scores[t] for s, t in pairs], np.float64),
+    }
+    for name in STUDENT_COLUMNS[1:]:
+        columns[name] = np.fromiter((getattr(student, name) for student in students), dtype=np.float64,
+                                    count=len(students))
+
+    # Similar-student index rows follow the cohort's order, with its own topic column order
+    similar = SimilarStudentIndex.build(aggregates)
+    improvements = [topic_improvements(aggregates[user_id]) for user_id in user_ids]
+    columns['similar_vectors'] = similar.vectors
+    columns['improvement_offsets'] = _offsets([len(student) for student in improvements])
+    columns['improvement_codes'] = _concatenate([[topics[topic] for topic in student] for student in improvements],
+                                                np.int32)
+    columns['improvement_values'] = _concatenate([list(student.values()) for student in improvements], np.float64)
+    if similar.inverted_lists is not None:
+        columns['similar_centroids'], columns['similar_assignment'] = similar.inverted_lists
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'students': len(students),
+        'topics': list(topics),
+        'similar_topics': [topics[topic] for topic in similar.topics],
+        'similar_trained': similar.inverted_lists is not None,
+        'integer_scores': all(isinstance(score, (int, np.integer)) for s, t in pairs for score in s.topic_scores[t]),
+        'peer_groups': [],
+    }
+
+    if peers is not None:
+        groups = list(peers.groups.items())
+        lengths = []
+        for metric in METRICS:
+            values = [group[metric].to_numpy() for _, group in groups]
+            columns[f'peer_{metric}'] = np.concatenate(values) if values else np.zeros(0)
+            lengths = [len(value) for value in values]
+        offsets = _offsets(lengths)
+        meta['peer_groups'] = [[kind, key.item() if isinstance(key, np.generic) else key, int(offsets[i]), int(offsets[i + 1])]
+                               for i, ((kind, key), _) in enumerate(groups)]
+
+    staging = path.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name, values in columns.items():
+        np.save(os.path.join(staging, f'{name}.npy'), values)
+    with open(os.path.join(staging, META_FILE), 'w', encoding='utf-8') as fp:
+        json.dump(meta, fp)
+
+    previous = path.rstrip(os.sep) + '.old'
+    if os.path.exists(path):
+        shutil.rmtree(previous, ignore_errors=True)
+        os.replace(path, previous)
+    os.replace(staging, path)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+class SnapshotAggregates(MutableMapping):
+    """user_id -> PerformanceAggregates backed by a snapshot; students are built on first access
+
+    Looked-up, updated and newly added students live in an in-memory overlay, so the mapping
+    can be used wherever a cohort's aggregates dict is expected.
+    """
+
+    def __init__(self, snapshot: 'CohortSnapshot'):
+        self.snapshot = snapshot
+        self._overlay: Dict[Any, PerformanceAggregates] = {}
+
+    def __getitem__(self, user_id: Any) -> PerformanceAggregates:
+        aggregates = self._overlay.get(user_id)
+        if aggregates is None:
+            row = self.snapshot.row(user_id)
+            if row is None:
+                raise KeyError(user_id)
+            aggregates = self._overlay[user_id] = self.snapshot.student(row)
+        return aggregates
+
+    def __setitem__(self, user_id: Any, aggregates: PerformanceAggregates):
+        self._overlay[user_id] = aggregates
+
+    def __delitem__(self, user_id: Any):
+        raise TypeError("Students cannot be removed from a snapshot")
+
+    def __contains__(self, user_id: Any) -> bool:
+        return user_id in self._overlay or self.snapshot.row(user_id) is not None
+
+    def __iter__(self) -> Iterator[Any]:
+        for user_id in self.snapshot.user_ids():
+            yield user_id
+        for user_id in self._overlay:
+            if self.snapshot.row(user_id) is None:
+                yield user_id
+
+    def __len__(self) -> int:
+        added = sum(1 for user_id in self._overlay if self.snapshot.row(user_id) is None)
+        return self.snapshot.student_count + added
+
+
+class SnapshotImprovements(MutableSequence):
+    """Per-row topic improvements of the similar-student index, decoded from the snapshot when read
+
+    Rows replaced or appended by the index live in an in-memory overlay.
+    """
+
+    def __init__(self, snapshot: 'CohortSnapshot'):
+        self.snapshot = snapshot
+        self._overlay: Dict[int, Dict[str, float]] = {}
+        self._length = snapshot.student_count
+
+    def __getitem__(self, row: int) -> Dict[str, float]:
+        improvements = self._overlay.get(row)
+        if improvements is None:
+            if not 0 <= row < self.snapshot.student_count:
+                raise IndexError(row)
+            start, end = self.snapshot.column('improvement_offsets')[row:row + 2]
+            topics = [self.snapshot.topics[code] for code in self.snapshot.column('improvement_codes')[start:end]]
+            improvements = dict(zip(topics, self.snapshot.column('improvement_values')[start:end].tolist()))
+        return improvements
+
+    def __setitem__(self, row: int, improvements: Dict[str, float]):
+        self._overlay[row] = improvements
+
+    def __delitem__(self, row: int):
+        raise TypeError("Students cannot be removed from a snapshot")
+
+    def __len__(self) -> int:
+        return self._length
+
+    def insert(self, row: int, improvements: Dict[str, float]):
+        if row != self._length:
+            raise TypeError("Rows can only be appended to a snapshot")
+        self._overlay[row] = improvements
+        self._length += 1
+
+
+class CohortSnapshot:
+    """Read-only, memory-mapped view of a snapshot written by write_snapshot"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as fp:
+            self.meta = json.load(fp)
+        if self.meta.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {self.meta.get('version')}")
+        # Register the topics, so submissions added on top of the snapshot map onto the same names
+        self.topics: List[str] = [default_taxonomy.canonical(topic) for topic in self.meta['topics']]
+        self.student_count: int = self.meta['students']
+        self.columns: Dict[str, np.ndarray] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Pickled e.g. to pool workers, which map the columns again instead of receiving copies
+        return dict(self.__dict__, columns={})
+
+    def column(self, name: str, mode: str = 'r') -> np.ndarray:
+        values = self.columns.get(name)
+        if values is None:
+            values = self.columns[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode=mode)
+        return values
+
+    def row(self, user_id: Any) -> Optional[int]:
+        """Row of a student, by binary search over the sorted user ids"""
+        ids = self.column('user_ids')
+        key = str(user_id).encode('utf-8')
+        if not len(ids) or len(key) > ids.dtype.itemsize:
+            return None
+        row = int(np.searchsorted(ids, key))
+        return row if row < len(ids) and ids[row] == key else None
+
+    def user_ids(self) -> Iterator[str]:
+        """User ids in the order of the cohort that was snapshotted"""
+        ids = self.column('user_ids')
+        for row in self.column('order'):
+            yield ids[row].decode('utf-8')
+
+    def student(self, row: int) -> PerformanceAggregates:
+        """Build the PerformanceAggregates of one student from the mapped columns"""
+        aggregates = PerformanceAggregates()
+        aggregates.count = int(self.column('count')[row])
+        for name in STUDENT_COLUMNS[1:]:
+            setattr(aggregates, name, float(self.column(name)[row]))
+
+        start, end = self.column('attempt_offsets')[row:row + 2]
+        aggregates.attempt_times = self.column('attempt_times')[start:end].tolist()
+        aggregates.accuracy_trend = self.column('attempt_accuracy')[start:end].tolist()
+        aggregates.accuracy_prefix = [0.0] + np.cumsum(self.column('attempt_accuracy')[start:end]).tolist()
+
+        first, last = self.column('topic_offsets')[row:row + 2]
+        score_offsets = self.column('topic_score_offsets')
+        topic_times = self.column('topic_times')
+        topic_scores = self.column('topic_scores')
+        for pair in range(first, last):
+            topic = self.topics[self.column('topic_codes')[pair]]
+            aggregates.topic_correct[topic] = int(self.column('topic_correct')[pair])
+            aggregates.topic_total[topic] = int(self.column('topic_total')[pair])
+            aggregates.topic_weighted_correct[topic] = float(self.column('topic_weighted_correct')[pair])
+            aggregates.topic_weighted_total[topic] = float(self.column('topic_weighted_total')[pair])
+            score_start, score_end = score_offsets[pair:pair + 2]
+            aggregates.topic_times[topic] = topic_times[score_start:score_end].tolist()
+            scores = topic_scores[score_start:score_end]
+            aggregates.topic_scores[topic] = (scores.astype(np.int64) if self.meta['integer_scores'] else scores).tolist()
+        return aggregates
+
+    @property
+    def aggregates(self) -> SnapshotAggregates:
+        return SnapshotAggregates(self)
+
+    @property
+    def peers(self) -> Optional[PercentileIndex]:
+        """Peer index whose groups are copied out of the mapped columns on their first lookup"""
+        if not self.meta['peer_groups']:
+            return None
+        index = PercentileIndex()
+        for kind, key, start, end in self.meta['peer_groups']:
+            index.groups[(kind, key)] = {
+                metric: SortedValues(self.column(f'peer_{metric}')[start:end]) for metric in METRICS
+            }
+        return index
+
+    @property
+    def similar(self) -> Optional[SimilarStudentIndex]:
+        """Similar-student index over the mapped vectors; rows are copied only when a student is updated
+
+        None for snapshots written without the vectors, whose cohort builds the index on first use.
+        """
+        if 'similar_topics' not in self.meta:
+            return None
+        trained = self.meta['similar_trained']
+        return SimilarStudentIndex.from_vectors(
+            list(self.user_ids()), [self.topics[code] for code in self.meta['similar_topics']],
+            self.column('similar_vectors', mode='c'), SnapshotImprovements(self),
+            self.column('similar_centroids') if trained else None,
+            self.column('similar_assignment') if trained else None,
+        )
+
+    def cohort(self) -> CohortAnalyzer:
+        cohort = CohortAnalyzer()
+        cohort.load_aggregates(self.aggregates, self.peers)
+        cohort.similar = self.similar
+        return cohort
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Aggregate submission exports into a memory-mappable cohort snapshot")
+    parser.add_argument('--historical', nargs='+', required=True, help="Submission exports (JSON array or JSON lines)")
+    parser.add_argument('--output', required=True, help="Snapshot directory to write")
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    cohort = load_cohort(*args.historical, batch_size=args.batch_size)
+    write_snapshot(args.output, cohort.aggregates, cohort.peers)
+    print(json.dumps({'students': len(cohort.aggregates), 'output': args.output}))
+
+
+if __name__ == "__main__":
+    main()
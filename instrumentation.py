@@ -0,0 +1,179 @@
+"""Opt-in timing, call-count and allocation metrics for the StudentAnalyzer hot paths
+
+Instrumentation works by wrapping the analyzer methods on enable() and restoring the
+originals on disable(), so nothing is added to the call path while it is switched off.
+The analyzer module is only imported on enable(), so importing this module is cheap.
+"""
+import functools
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Callable, Iterator, Tuple
+
+INSTRUMENTED_METHODS = [
+    'load_data',
+    'analyze_performance_trends',
+    'identify_weak_areas',
+    '_identify_strengths',
+    '_calculate_consistency',
+    'generate_student_persona',
+    'generate_recommendations',
+]
+METRIC_PREFIX = 'student_analyzer'
+
+
+class _Stat:
+    __slots__ = ('calls', 'seconds', 'max_seconds', 'allocated_bytes')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.allocated_bytes = 0
+
+
+_lock = threading.Lock()
+_stats: Dict[str, _Stat] = {}
+_originals: Dict[str, Callable] = {}
+_track_allocations = False
+_local = threading.local()
+
+
+def _record(name: str, seconds: float, allocated: int):
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = _Stat()
+        stat.calls += 1
+        stat.seconds += seconds
+        stat.max_seconds = max(stat.max_seconds, seconds)
+        stat.allocated_bytes += allocated
+    for captured in getattr(_local, 'captures', ()):
+        captured.append((name, seconds))
+
+
+def _wrap(name: str, method: Callable) -> Callable:
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        allocated_before = tracemalloc.get_traced_memory()[0] if _track_allocations else 0
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - started
+            allocated = tracemalloc.get_traced_memory()[0] - allocated_before if _track_allocations else 0
+            _record(name, seconds, max(allocated, 0))
+    return wrapper
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable(track_allocations: bool = False):
+    """Start recording metrics for the StudentAnalyzer hot paths (idempotent)"""
+    global _track_allocations
+    from student_recommendations import StudentAnalyzer
+    with _lock:
+        if track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _track_allocations = track_allocations and tracemalloc.is_tracing()
+        if _originals:
+            return
+        for name in INSTRUMENTED_METHODS:
+            method = StudentAnalyzer.__dict__[name]
+            _originals[name] = method
+            setattr(StudentAnalyzer, name, _wrap(name, method))
+
+
+def disable():
+    """Restore the uninstrumented methods; recorded metrics are kept until reset()"""
+    global _track_allocations
+    with _lock:
+        if not _originals:
+            _track_allocations = False
+            return
+        from student_recommendations import StudentAnalyzer
+        for name, method in _originals.items():
+            setattr(StudentAnalyzer, name, method)
+        _originals.clear()
+        _track_allocations = False
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Structured copy of the metrics recorded so far, keyed by method name"""
+    with _lock:
+        return {
+            name: {
+                'calls': stat.calls,
+                'total_ms': round(stat.seconds * 1000, 3),
+                'mean_ms': round(stat.seconds * 1000 / stat.calls, 3) if stat.calls else 0.0,
+                'max_ms': round(stat.max_seconds * 1000, 3),
+                'allocated_kib': round(stat.allocated_bytes / 1024, 1)
+            }
+            for name, stat in _stats.items()
+        }
+
+
+@contextmanager
+def capture() -> Iterator[List[Tuple[str, float]]]:
+    """Collect (method, seconds) for instrumented calls made by this thread inside the block"""
+    captured: List[Tuple[str, float]] = []
+    stack = getattr(_local, 'captures', ())
+    _local.captures = stack + (captured,)
+    try:
+        yield captured
+    finally:
+        _local.captures = stack
+
+
+def prometheus_text() -> str:
+    """Render the metrics in the Prometheus text exposition format"""
+    with _lock:
+        stats = list(_stats.items())
+    lines = [
+        f"# HELP {METRIC_PREFIX}_calls_total Number of calls per analyzer method",
+        f"# TYPE {METRIC_PREFIX}_calls_total counter",
+    ]
+    lines += [f'{METRIC_PREFIX}_calls_total{{method="{name}"}} {stat.calls}' for name, stat in stats]
+    lines += [
+        f"# HELP {METRIC_PREFIX}_seconds_total Wall time spent per analyzer method",
+        f"# TYPE {METRIC_PREFIX}_seconds_total counter",
+    ]
+    lines += [f'{METRIC_PREFIX}_seconds_total{{method="{name}"}} {stat.seconds:.6f}' for name, stat in stats]
+    lines += [
+        f"# HELP {METRIC_PREFIX}_allocated_bytes_total Net memory allocated per analyzer method",
+        f"# TYPE {METRIC_PREFIX}_allocated_bytes_total counter",
+    ]
+    lines += [f'{METRIC_PREFIX}_allocated_bytes_total{{method="{name}"}} {stat.allocated_bytes}' for name, stat in stats]
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int = 9464, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Serve /metrics on a local port from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,86 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Any, Iterable, Iterator, Tuple
+
+from cohort_analysis import CohortAnalyzer, aggregate_by_user
+from peer_index import PercentileIndex
+from similar_students import SimilarStudentIndex
+from student_recommendations import PerformanceAggregates, normalize_submissions
+from worker_state import cohort_indexes, init_worker
+
+
+def shard_students(aggregates: Dict[str, PerformanceAggregates],
+                   chunk_size: int) -> Iterator[List[Tuple[str, PerformanceAggregates]]]:
+    """Yield (user_id, aggregates) pairs in chunks of at most chunk_size students"""
+    students = list(aggregates.items())
+    for start in range(0, len(students), chunk_size):
+        yield students[start:start + chunk_size]
+
+
+def analyze_chunk(students: List[Tuple[str, PerformanceAggregates]], peers: PercentileIndex = None,
+                  similar: SimilarStudentIndex = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """Analyze one shard of students from their precomputed aggregates; runs inside a worker process"""
+    # Peer percentiles and similar students come from the whole cohort, not just this shard
+    peers, similar = cohort_indexes(peers, similar)
+    cohort = CohortAnalyzer()
+    cohort.load_aggregates(dict(students), peers)
+    if similar is not None:
+        cohort.similar = similar
+    return list(cohort.analyze().items())
+
+
+class ParallelCohortRunner:
+    """Shard a cohort across a process pool and stream per-student results back"""
+
+    def __init__(self, workers: int = None, chunk_size: int = 500):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.stats: Dict[str, Any] = {}
+
+    def iter_results(self, submissions: Iterable[Dict]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield (user_id, {'persona', 'recommendations'}) pairs as soon as each shard finishes"""
+        started = time.perf_counter()
+        self.stats = {'workers': self.workers, 'chunk_size': self.chunk_size, 'chunks': 0, 'students': 0}
+        # One vectorized pass over the whole cohort; workers only build reports from its aggregates
+        frame = normalize_submissions(list(submissions))
+        aggregates = aggregate_by_user(frame)
+        peers = PercentileIndex.from_frame(frame)
+        similar = SimilarStudentIndex.build(aggregates)
+        shards = shard_students(aggregates, self.chunk_size)
+
+        if self.workers == 1:
+            for shard in shards:
+                yield from self._record(analyze_chunk(shard, peers, similar), started)
+            return
+
+        # Keep a bounded number of shards in flight so memory does not grow with the cohort
+        max_pending = self.workers * 2
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                 initargs=(peers, similar)) as pool:
+            pending = set()
+            for shard in shards:
+                pending.add(pool.submit(analyze_chunk, shard))
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from self._record(future.result(), started)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from self._record(future.result(), started)
+
+    def run(self, submissions: Iterable[Dict]) -> Dict[str, Dict[str, Any]]:
+        """Analyze the whole cohort and return results keyed by user_id"""
+        return dict(self.iter_results(submissions))
+
+    def _record(self, results: List[Tuple[str, Dict[str, Any]]], started: float) -> List[Tuple[str, Dict[str, Any]]]:
+        """Update throughput statistics for a finished shard"""
+        self.stats['chunks'] += 1
+        self.stats['students'] += len(results)
+        elapsed = time.perf_counter() - started
+        self.stats['seconds'] = round(elapsed, 3)
+        self.stats['students_per_second'] = round(self.stats['students'] / elapsed, 1) if elapsed else 0.0
+        return results
@@ -0,0 +1,188 @@
+"""Per-quiz and per-topic percentile index over all submissions of a cohort
+
+Values are kept in sorted float arrays, so a percentile lookup is a binary search. New
+submissions are buffered and merged into the sorted arrays on the next lookup.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Any, Optional, Tuple, Union, TYPE_CHECKING
+
+import numpy as np
+
+from records import SubmissionRecord, as_submission_record
+from topic_taxonomy import default_taxonomy
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+GROUP_COLUMNS = {'quiz': 'quiz_id', 'topic': 'topic_id'}
+# correct_rate is correct_answers / total_questions * 100, the measure the weak-area rules use
+METRICS = ('score', 'accuracy', 'speed', 'correct_rate')
+
+
+def correct_rate(correct, total):
+    """correct / total * 100 (0 without questions), for scalars or arrays
+
+    Used both to build the correct_rate groups and to look values up in them, so a student's
+    own attempt compares as a tie rather than one floating-point step above or below it.
+    """
+    if isinstance(total, np.ndarray):
+        return np.divide(correct, total, out=np.zeros_like(correct), where=total > 0) * 100
+    return correct / total * 100 if total else 0.0
+
+
+def _metric_columns(frame: 'pd.DataFrame') -> Dict[str, np.ndarray]:
+    total = frame['total_questions'].to_numpy(dtype=np.float64)
+    correct = frame['correct_answers'].to_numpy(dtype=np.float64)
+    return {
+        'score': frame['score'].to_numpy(dtype=np.float64),
+        'accuracy': frame['accuracy'].to_numpy(dtype=np.float64),
+        'speed': frame['speed'].to_numpy(dtype=np.float64),
+        'correct_rate': correct_rate(correct, total),
+    }
+
+
+def _metric_values(submission: SubmissionRecord) -> Dict[str, float]:
+    return {
+        'score': float(submission.score),
+        'accuracy': submission.accuracy,
+        'speed': submission.speed,
+        'correct_rate': correct_rate(submission.correct_answers, submission.total_questions),
+    }
+
+
+class SortedValues:
+    """A growing multiset of floats answering rank queries by binary search"""
+
+    def __init__(self, values: np.ndarray = None):
+        # Sorted source values (possibly a read-only memory map), copied into an array('d') on first use;
+        # array('d') keeps the values compact and is much faster to bisect than a numpy array
+        self._source = values
+        self._values: Optional[array] = None
+        self._pending: List[float] = []
+
+    @property
+    def values(self) -> array:
+        if self._values is None:
+            self._values = array('d')
+            if self._source is not None:
+                self._values.frombytes(np.ascontiguousarray(self._source, dtype=np.float64).tobytes())
+                self._source = None
+        return self._values
+
+    @values.setter
+    def values(self, values: array):
+        self._values = values
+        self._source = None
+
+    def __len__(self) -> int:
+        if self._values is not None:
+            stored = len(self._values)
+        else:
+            stored = len(self._source) if self._source is not None else 0
+        return stored + len(self._pending)
+
+    def to_numpy(self) -> np.ndarray:
+        """All values in sorted order"""
+        self._settle()
+        return np.frombuffer(self.values, dtype=np.float64)
+
+    def add(self, value: float):
+        self._pending.append(value)
+
+    def extend(self, other: 'SortedValues'):
+        other._settle()
+        self._insert_sorted(np.frombuffer(other.values, dtype=np.float64))
+
+    def _insert_sorted(self, values: np.ndarray):
+        if not len(values):
+            return
+        current = np.frombuffer(self.values, dtype=np.float64)
+        merged = np.insert(current, np.searchsorted(current, values), values)
+        self.values = array('d', merged.tobytes())
+
+    def _settle(self):
+        if self._pending:
+            pending = np.sort(np.asarray(self._pending, dtype=np.float64))
+            self._pending = []
+            self._insert_sorted(pending)
+
+    def percentile(self, value: float) -> Optional[float]:
+        """Percentage of values below value, counting ties as half"""
+        self._settle()
+        if not self.values:
+            return None
+        return (bisect_left(self.values, value) + bisect_right(self.values, value)) * 50 / len(self.values)
+
+
+class PercentileIndex:
+    """Sorted score, accuracy, speed and correct_rate values per quiz and per topic"""
+
+    def __init__(self):
+        self.groups: Dict[Tuple[str, Any], Dict[str, SortedValues]] = {}
+
+    @classmethod
+    def from_frame(cls, frame: 'pd.DataFrame') -> 'PercentileIndex':
+        """Build the index from a normalized submission table"""
+        import pandas as pd
+
+        index = cls()
+        if frame.empty:
+            return index
+        metrics = _metric_columns(frame)
+        for kind, column in GROUP_COLUMNS.items():
+            codes, keys = pd.factorize(frame[column], use_na_sentinel=False)
+            if kind == 'topic':
+                # Topics are grouped by integer id and keyed by canonical name
+                keys = [default_taxonomy.name(code) for code in keys]
+            boundaries = np.cumsum(np.bincount(codes, minlength=len(keys)))[:-1]
+            for metric, values in metrics.items():
+                # Sort by group, then by value, and cut the result into one sorted array per group
+                ordered = np.split(values[np.lexsort((values, codes))], boundaries)
+                for key, sorted_values in zip(keys, ordered):
+                    key = None if pd.isna(key) else key
+                    index.groups.setdefault((kind, key), {})[metric] = SortedValues(sorted_values)
+        return index
+
+    def _group(self, kind: str, key: Any) -> Dict[str, SortedValues]:
+        group = self.groups.get((kind, key))
+        if group is None:
+            group = self.groups[(kind, key)] = {metric: SortedValues() for metric in METRICS}
+        return group
+
+    def add(self, submission: Union[Dict, SubmissionRecord]):
+        """Add one submission to its quiz and topic groups"""
+        submission = as_submission_record(submission, keep_responses=False)
+        values = _metric_values(submission)
+        for kind, key in (('quiz', submission.quiz_id), ('topic', submission.topic)):
+            group = self._group(kind, key)
+            for metric, value in values.items():
+                group[metric].add(value)
+
+    def merge(self, other: 'PercentileIndex') -> 'PercentileIndex':
+        """Fold another index (e.g. of a later batch of submissions) into this one"""
+        for (kind, key), other_group in other.groups.items():
+            group = self._group(kind, key)
+            for metric, values in other_group.items():
+                group[metric].extend(values)
+        return self
+
+    def size(self, kind: str, key: Any) -> int:
+        group = self.groups.get((kind, key))
+        return len(group['score']) if group else 0
+
+    def percentile(self, kind: str, key: Any, metric: str, value: float) -> Optional[float]:
+        """Percentile of value among the kind ('quiz' or 'topic') group's submissions, None without peers"""
+        group = self.groups.get((kind, key))
+        if group is None:
+            return None
+        return group[metric].percentile(value)
+
+    def submission_percentiles(self, submission: Union[Dict, SubmissionRecord]) -> Dict[str, Optional[float]]:
+        """Score, accuracy and speed percentiles of a submission among all attempts at the same quiz"""
+        submission = as_submission_record(submission, keep_responses=False)
+        values = _metric_values(submission)
+        return {
+            metric: self.percentile('quiz', submission.quiz_id, metric, values[metric])
+            for metric in ('score', 'accuracy', 'speed')
+        }
@@ -0,0 +1,327 @@
+"""Question difficulty calibrated from the responses of all submissions
+
+Every scored response is one entry of a sparse students x questions matrix (kept as parallel
+arrays). Difficulties and student abilities are fitted to it with a Rasch (one-parameter
+logistic) model: P(correct) = sigmoid(ability - difficulty). Each Newton step is a handful of
+vectorized bincounts over the responses, and new attempts warm-start from the previous
+estimates, so recalibrating after an update takes only a few steps. The fit works on copies,
+so a long-running owner can run it in a worker thread and keep serving the last estimates.
+"""
+from typing import Dict, List, Any, Collection, Iterable, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from quiz_scoring import QuizIndex, QuizScorer, default_scorer
+from records import SubmissionRecord, as_submission_record
+
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-2
+# Standard normal prior on abilities and difficulties; keeps all-correct/all-wrong rows finite
+PRIOR_PRECISION = 1.0
+EASY_BELOW = -0.5
+HARD_ABOVE = 0.5
+
+
+def difficulty_level(difficulty: float) -> str:
+    """Label a calibrated difficulty (logit scale, 0 = average) as easy, medium or hard"""
+    if difficulty < EASY_BELOW:
+        return 'easy'
+    if difficulty > HARD_ABOVE:
+        return 'hard'
+    return 'medium'
+
+
+def _logit(probability: float) -> float:
+    return float(np.log(probability / (1 - probability)))
+
+
+def _grow(values: np.ndarray, size: int) -> np.ndarray:
+    if len(values) >= size:
+        return values
+    return np.concatenate([values, np.zeros(size - len(values), dtype=values.dtype)])
+
+
+def fit_rasch(students: np.ndarray, questions: np.ndarray, outcomes: np.ndarray, difficulty: np.ndarray,
+              ability: np.ndarray, attempted: np.ndarray,
+              max_iterations: int = MAX_ITERATIONS) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Newton steps of the Rasch model from the given estimates; returns (difficulty, ability, steps)"""
+    difficulty, ability = difficulty.copy(), ability.copy()
+    n_questions, n_students = len(difficulty), len(ability)
+    steps = 0
+    for steps in range(1, max_iterations + 1):
+        probability = 1 / (1 + np.exp(difficulty[questions] - ability[students]))
+        residual = np.bincount(questions, weights=probability - outcomes, minlength=n_questions)
+        information = np.bincount(questions, weights=probability * (1 - probability), minlength=n_questions)
+        difficulty_step = (residual - PRIOR_PRECISION * difficulty) / (information + PRIOR_PRECISION)
+        difficulty += difficulty_step
+        # Only differences between ability and difficulty are identified; anchor the
+        # attempted questions at mean 0 so the shared shift cannot drift between steps
+        shift = difficulty[attempted].mean() if len(attempted) else 0.0
+        difficulty[attempted] -= shift
+        ability -= shift
+
+        probability = 1 / (1 + np.exp(difficulty[questions] - ability[students]))
+        residual = np.bincount(students, weights=outcomes - probability, minlength=n_students)
+        information = np.bincount(students, weights=probability * (1 - probability), minlength=n_students)
+        ability_step = (residual - PRIOR_PRECISION * ability) / (information + PRIOR_PRECISION)
+        ability += ability_step
+
+        if max(np.abs(difficulty_step).max(initial=0), np.abs(ability_step).max(initial=0)) < TOLERANCE:
+            break
+    return difficulty, ability, steps
+
+
+class DifficultyCalibrator:
+    """Per-question correctness rates and calibrated difficulties, updated as attempts arrive"""
+
+    def __init__(self, scorer: QuizScorer = None):
+        self.scorer = scorer or default_scorer
+        self.question_ids: List[int] = []
+        self.question_topics: List[str] = []
+        self._question_codes: Dict[int, int] = {}
+        self.student_ids: List[Any] = []
+        self._student_codes: Dict[Any, int] = {}
+        # (quiz id, updated_at) -> (sorted option ids, question code per option, is_correct per option)
+        self._option_tables: Dict[Tuple[Any, Any], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._pending: Dict[Tuple[Any, Any], List[Tuple[int, np.ndarray, np.ndarray]]] = {}
+
+        # Responses as COO entries of the students x questions matrix
+        self._students: List[np.ndarray] = []
+        self._questions: List[np.ndarray] = []
+        self._outcomes: List[np.ndarray] = []
+        self.attempts = np.zeros(0, dtype=np.int64)
+        self.correct = np.zeros(0, dtype=np.int64)
+        self.difficulty = np.zeros(0)
+        self.ability = np.zeros(0)
+        # Responses added so far, and how many of them the current estimates were fitted to
+        self._revision = 0
+        self._calibrated_revision = 0
+        self._fitting_revision = 0
+        # False serves the last fitted estimates on reads and leaves refitting to the owner
+        self.refit_on_read = True
+        self._topic_order: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        # Response question codes grouped by student (student codes sorted alongside); built on the first
+        # flush, then new responses are merged in on each later flush instead of re-sorting all of them
+        self._by_student: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def stale(self) -> bool:
+        """True if responses arrived since the current estimates were fitted"""
+        return self._calibrated_revision != self._revision
+
+    @property
+    def response_count(self) -> int:
+        return int(self.attempts.sum()) + sum(len(questions) for batch in self._pending.values()
+                                              for _, questions, _ in batch)
+
+    def _option_table(self, index: QuizIndex) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        key = (index.quiz_id, index.updated_at)
+        table = self._option_tables.get(key)
+        if table is None:
+            for question_id, topic in index.question_topics.items():
+                if question_id not in self._question_codes:
+                    self._question_codes[question_id] = len(self.question_ids)
+                    self.question_ids.append(question_id)
+                    self.question_topics.append(topic)
+            option_ids = np.fromiter(index.options, dtype=np.int64, count=len(index.options))
+            order = np.argsort(option_ids)
+            entries = list(index.options.values())
+            question_codes = np.array([self._question_codes[entry[0]] for entry in entries], dtype=np.int64)
+            is_correct = np.array([entry[2] for entry in entries], dtype=bool)
+            table = self._option_tables[key] = (option_ids[order], question_codes[order], is_correct[order])
+        return table
+
+    def add_submission(self, submission: Union[Dict, SubmissionRecord], quiz: Dict = None):
+        """Queue the responses of one attempt; quiz defaults to the submission's own quiz (via the scorer)"""
+        record = as_submission_record(submission)
+        if record.question_ids is None or not len(record.question_ids):
+            return
+        index = self.scorer.index_for(quiz or {'id': record.quiz.id, 'updated_at': record.quiz.updated_at})
+        self._option_table(index)
+
+        student = self._student_codes.get(record.user_id)
+        if student is None:
+            student = self._student_codes[record.user_id] = len(self.student_ids)
+            self.student_ids.append(record.user_id)
+        self._pending.setdefault((index.quiz_id, index.updated_at), []).append((
+            student,
+            np.frombuffer(record.question_ids, dtype=np.int64),
+            np.frombuffer(record.option_ids, dtype=np.int64),
+        ))
+        self._revision += 1
+
+    def extend(self, submissions: Iterable[Union[Dict, SubmissionRecord]], quiz: Dict = None):
+        for submission in submissions:
+            self.add_submission(submission, quiz)
+
+    def _flush(self):
+        """Score queued responses per quiz with one vectorized lookup and append them to the matrix"""
+        n_questions = len(self.question_ids)
+        self.attempts = _grow(self.attempts, n_questions)
+        self.correct = _grow(self.correct, n_questions)
+        self.difficulty = _grow(self.difficulty, n_questions)
+        self.ability = _grow(self.ability, len(self.student_ids))
+
+        known_questions = np.asarray(self.question_ids, dtype=np.int64)
+        for key, batch in self._pending.items():
+            option_ids, question_codes, is_correct = self._option_tables[key]
+            students = np.repeat([student for student, _, _ in batch], [len(questions) for _, questions, _ in batch])
+            questions = np.concatenate([questions for _, questions, _ in batch])
+            options = np.concatenate([options for _, _, options in batch])
+
+            positions = np.minimum(np.searchsorted(option_ids, options), len(option_ids) - 1)
+            codes = question_codes[positions]
+            # Drop options that are not part of this quiz revision or do not belong to the question
+            valid = (option_ids[positions] == options) & (known_questions[codes] == questions)
+            students, codes, outcomes = students[valid], codes[valid], is_correct[positions][valid]
+
+            self._students.append(students)
+            self._questions.append(codes)
+            self._outcomes.append(outcomes)
+            self.attempts += np.bincount(codes, minlength=n_questions)
+            self.correct += np.bincount(codes, weights=outcomes, minlength=n_questions).astype(np.int64)
+            if self._by_student is not None:
+                sorted_students, sorted_questions = self._by_student
+                order = np.argsort(students, kind='stable')
+                at = np.searchsorted(sorted_students, students[order], side='right')
+                self._by_student = (np.insert(sorted_students, at, students[order]),
+                                    np.insert(sorted_questions, at, codes[order]))
+        self._pending = {}
+        if self._by_student is None:
+            students, questions, _ = self._responses()
+            order = np.argsort(students, kind='stable')
+            self._by_student = (students[order], questions[order])
+
+    def _responses(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if len(self._students) > 1:
+            self._students = [np.concatenate(self._students)]
+            self._questions = [np.concatenate(self._questions)]
+            self._outcomes = [np.concatenate(self._outcomes)]
+        if not self._students:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        return self._students[0], self._questions[0], self._outcomes[0].astype(np.float64)
+
+    def calibrate(self, max_iterations: int = MAX_ITERATIONS) -> int:
+        """Fit difficulties and abilities to all responses, starting from the current estimates
+
+        Returns the number of Newton steps taken.
+        """
+        inputs = self.fit_inputs()
+        if inputs is None:
+            return 0
+        difficulty, ability, steps = fit_rasch(*inputs, max_iterations=max_iterations)
+        self.apply_fit(difficulty, ability)
+        return steps
+
+    def fit_inputs(self) -> Optional[Tuple[np.ndarray, ...]]:
+        """Arguments for fit_rasch over all responses so far (None if the estimates are current)"""
+        if self._pending:
+            self._flush()
+        if not self.stale:
+            return None
+        self._fitting_revision = self._revision
+        students, questions, outcomes = self._responses()
+        return students, questions, outcomes, self.difficulty, self.ability, np.flatnonzero(self.attempts)
+
+    def apply_fit(self, difficulty: np.ndarray, ability: np.ndarray):
+        """Publish estimates from fit_rasch; questions and students added meanwhile start at 0"""
+        self.difficulty = _grow(difficulty, len(self.question_ids))
+        self.ability = _grow(ability, len(self.student_ids))
+        self._calibrated_revision = self._fitting_revision
+        self._topic_order = {}
+
+    def _refresh(self):
+        if self.refit_on_read:
+            self.calibrate()
+
+    def question_difficulty(self, question_id: int) -> Optional[Dict[str, Any]]:
+        """Correctness rate and calibrated difficulty of one question (None if it was never seen)"""
+        self._refresh()
+        code = self._question_codes.get(question_id)
+        if code is None:
+            return None
+        attempts = int(self.attempts[code])
+        difficulty = float(self.difficulty[code])
+        return {
+            'question_id': question_id,
+            'topic': self.question_topics[code],
+            'attempts': attempts,
+            'correct_rate': float(self.correct[code] / attempts * 100) if attempts else None,
+            'difficulty': difficulty,
+            'difficulty_level': difficulty_level(difficulty) if attempts else None
+        }
+
+    def difficulty_levels(self) -> Dict[int, str]:
+        """Calibrated difficulty_level for every question that has been attempted"""
+        self._refresh()
+        return {
+            question_id: difficulty_level(difficulty)
+            for question_id, difficulty, attempts in zip(self.question_ids, self.difficulty.tolist(), self.attempts)
+            if attempts
+        }
+
+    def _topic_questions(self, topic: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Known questions of a topic as (difficulties, question ids, attempted), sorted by difficulty
+
+        Questions nobody has attempted yet are kept at the prior mean difficulty of 0.
+        """
+        self._refresh()
+        if not self._topic_order:
+            n_questions = len(self.difficulty)
+            topics = np.asarray(self.question_topics[:n_questions], dtype=object)
+            question_ids = np.asarray(self.question_ids[:n_questions], dtype=np.int64)
+            attempted = self.attempts[:n_questions] > 0
+            for name in set(topics.tolist()):
+                codes = np.flatnonzero(topics == name)
+                codes = codes[np.argsort(self.difficulty[codes], kind='stable')]
+                self._topic_order[name] = (self.difficulty[codes], question_ids[codes], attempted[codes])
+        return self._topic_order.get(topic, (np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)))
+
+    def topic_difficulty(self, topic: str) -> Optional[float]:
+        """Mean calibrated difficulty of the attempted questions of a topic"""
+        difficulties, _, attempted = self._topic_questions(topic)
+        return float(difficulties[attempted].mean()) if attempted.any() else None
+
+    def target_difficulty(self, topic: str, accuracy: float, success_rate: float) -> Optional[float]:
+        """Difficulty at which a student with this topic accuracy (percent) succeeds at success_rate
+
+        The student's ability in the topic is estimated as the topic's mean difficulty plus the
+        logit of their accuracy, clipped to 5-95% so a handful of attempts cannot run off the scale.
+        """
+        mean_difficulty = self.topic_difficulty(topic)
+        if mean_difficulty is None:
+            return None
+        ability = mean_difficulty + _logit(min(max(accuracy / 100, 0.05), 0.95))
+        return ability - _logit(success_rate)
+
+    def pick_questions(self, topic: str, target: float, count: int, exclude: Collection[int] = ()) -> List[int]:
+        """Ids of up to count questions of a topic whose difficulty is closest to target, skipping exclude"""
+        difficulties, question_ids, _ = self._topic_questions(topic)
+        right = int(np.searchsorted(difficulties, target))
+        left = right - 1
+        picked = []
+        while len(picked) < count and (left >= 0 or right < len(difficulties)):
+            if right >= len(difficulties) or (left >= 0 and target - difficulties[left] <= difficulties[right] - target):
+                question_id = int(question_ids[left])
+                left -= 1
+            else:
+                question_id = int(question_ids[right])
+                right += 1
+            if question_id not in exclude:
+                picked.append(question_id)
+        return picked
+
+    def answered_questions(self, user_id: Any) -> Set[int]:
+        """Ids of the questions a student has responded to, including responses not yet fitted"""
+        student = self._student_codes.get(user_id)
+        if student is None:
+            return set()
+        answered = set()
+        if self._by_student is not None:
+            students, questions = self._by_student
+            start, end = np.searchsorted(students, [student, student + 1])
+            answered.update(self.question_ids[code] for code in questions[start:end].tolist())
+        for batch in self._pending.values():
+            answered.update(question for code, question_ids, _ in batch if code == student
+                            for question in question_ids.tolist())
+        return answered
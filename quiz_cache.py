@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Dict, Optional, Union
+
+from quiz_scoring import QuizIndex, unwrap_quiz
+
+DEFAULT_CATALOG_PATH = os.path.join('.cache', 'quiz_catalog.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quizzes (
+    quiz_id INTEGER PRIMARY KEY,
+    updated_at TEXT,
+    meta TEXT NOT NULL,
+    topics TEXT NOT NULL,
+    question_ids BLOB NOT NULL,
+    question_topics BLOB NOT NULL,
+    option_ids BLOB NOT NULL,
+    option_questions BLOB NOT NULL,
+    option_correct BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS quiz_files (
+    content_hash TEXT PRIMARY KEY,
+    quiz_id INTEGER NOT NULL,
+    updated_at TEXT
+);
+"""
+
+
+def _pack(values, typecode: str = 'q') -> bytes:
+    return array(typecode, values).tobytes()
+
+
+def _unpack(blob: bytes, typecode: str = 'q') -> array:
+    values = array(typecode)
+    values.frombytes(blob)
+    return values
+
+
+class QuizCatalog:
+    """SQLite cache of slimmed quiz definitions keyed by quiz id and invalidated on updated_at
+
+    Only question ids, option ids, topics, correctness and the marking scheme are stored, as
+    packed integer arrays, so a cached quiz is rebuilt without parsing any question text.
+    """
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def get(self, quiz_id: int, updated_at: str = None) -> Optional[QuizIndex]:
+        """Return the cached index, or None if missing or cached for a different updated_at"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT updated_at, meta, topics, question_ids, question_topics, option_ids, "
+                "option_questions, option_correct FROM quizzes WHERE quiz_id = ?",
+                (quiz_id,)
+            ).fetchone()
+        if row is None or (updated_at is not None and row[0] != updated_at):
+            return None
+
+        _, meta, topics, question_ids, question_topics, option_ids, option_questions, option_correct = row
+        topics = json.loads(topics)
+        questions = zip(_unpack(question_ids), (topics[code] for code in _unpack(question_topics, 'i')))
+        options = zip(_unpack(option_ids), _unpack(option_questions), map(bool, _unpack(option_correct, 'b')))
+        return QuizIndex.from_tables(json.loads(meta), questions, options)
+
+    def put(self, quiz: Union[Dict, QuizIndex]) -> QuizIndex:
+        """Store (or replace) a quiz definition and return its index"""
+        index = quiz if isinstance(quiz, QuizIndex) else QuizIndex(unwrap_quiz(quiz))
+        meta, questions, options = index.tables()
+        topic_codes: Dict[str, int] = {}
+        for _, topic in questions:
+            topic_codes.setdefault(topic, len(topic_codes))
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO quizzes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    index.quiz_id,
+                    index.updated_at,
+                    json.dumps(meta),
+                    json.dumps(list(topic_codes)),
+                    _pack(question_id for question_id, _ in questions),
+                    _pack((topic_codes[topic] for _, topic in questions), 'i'),
+                    _pack(option_id for option_id, _, _ in options),
+                    _pack(question_id for _, question_id, _ in options),
+                    _pack((is_correct for _, _, is_correct in options), 'b'),
+                )
+            )
+        return index
+
+    def load(self, content: bytes) -> QuizIndex:
+        """Return the index for a raw quiz file, skipping JSON parsing when its content was seen before"""
+        content_hash = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT quiz_id, updated_at FROM quiz_files WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+        if row is not None:
+            index = self.get(*row)
+            if index is not None:
+                return index
+
+        index = self.put(json.loads(content))
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO quiz_files VALUES (?, ?, ?)",
+                (content_hash, index.quiz_id, index.updated_at)
+            )
+        return index
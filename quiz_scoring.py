@@ -0,0 +1,166 @@
+from collections import OrderedDict
+from typing import Dict, List, Any, Iterable, Tuple, Union
+
+from records import SubmissionRecord
+from topic_taxonomy import default_taxonomy
+
+
+def unwrap_quiz(quiz: Dict) -> Dict:
+    """Return the quiz object whether or not it is wrapped as {"quiz": {...}} like the current-quiz export"""
+    if 'questions' not in quiz and isinstance(quiz.get('quiz'), dict):
+        return quiz['quiz']
+    return quiz
+
+
+def submission_responses(submission: Union[Dict, SubmissionRecord]) -> Union[Dict, Iterable[Tuple[int, int]]]:
+    """The response_map of a raw submission, or the response pairs of a SubmissionRecord"""
+    if isinstance(submission, SubmissionRecord):
+        return submission.responses()
+    return submission.get('response_map')
+
+
+QUIZ_META_FIELDS = ['id', 'updated_at', 'title', 'topic', 'questions_count', 'correct_answer_marks', 'negative_marks']
+
+
+class QuizIndex:
+    """Lookup tables for scoring submissions to one quiz, built once per quiz definition"""
+
+    def __init__(self, quiz: Dict):
+        quiz = unwrap_quiz(quiz)
+        questions = []
+        options = []
+        for question in quiz.get('questions', []):
+            # The question's source topic_id and its quiz topic (as parent) are recorded on the canonical topic
+            topic = default_taxonomy.canonical(question.get('topic') or quiz.get('topic'), question.get('topic_id'),
+                                               parent=quiz.get('topic'))
+            questions.append((question['id'], topic))
+            for option in question.get('options', []):
+                options.append((option['id'], question['id'], bool(option.get('is_correct'))))
+        self._build({field: quiz.get(field) for field in QUIZ_META_FIELDS}, questions, options)
+
+    @classmethod
+    def from_tables(cls, meta: Dict, questions: Iterable[Tuple[int, str]],
+                    options: Iterable[Tuple[int, int, bool]]) -> 'QuizIndex':
+        """Rebuild an index from the slim tables returned by tables() (e.g. from a quiz cache)"""
+        index = cls.__new__(cls)
+        index._build(meta, questions, options)
+        return index
+
+    def _build(self, meta: Dict, questions: Iterable[Tuple[int, str]], options: Iterable[Tuple[int, int, bool]]):
+        self.meta = dict(meta, topic=default_taxonomy.canonical(meta.get('topic')))
+        self.quiz_id = meta.get('id')
+        self.updated_at = meta.get('updated_at')
+        self.topic = self.meta['topic']
+        self.correct_answer_marks = float(meta.get('correct_answer_marks') or 0)
+        self.negative_marks = float(meta.get('negative_marks') or 0)
+        self.question_topics: Dict[int, str] = {}
+        self.topic_question_counts: Dict[str, int] = {}
+        # option id -> (question id, topic, is_correct)
+        self.options: Dict[int, Tuple[int, str, bool]] = {}
+
+        for question_id, topic in questions:
+            topic = default_taxonomy.canonical(topic)
+            self.question_topics[question_id] = topic
+            self.topic_question_counts[topic] = self.topic_question_counts.get(topic, 0) + 1
+        for option_id, question_id, is_correct in options:
+            self.options[option_id] = (question_id, self.question_topics[question_id], is_correct)
+
+    def tables(self) -> Tuple[Dict, List[Tuple[int, str]], List[Tuple[int, int, bool]]]:
+        """Slim representation of the quiz: metadata, (question id, topic) and (option id, question id, is_correct)"""
+        questions = list(self.question_topics.items())
+        options = [(option_id, entry[0], entry[2]) for option_id, entry in self.options.items()]
+        return dict(self.meta), questions, options
+
+    def summary(self) -> Dict:
+        """Quiz metadata without question bodies; usable wherever a current_quiz dict is expected"""
+        return dict(self.meta)
+
+    @property
+    def question_count(self) -> int:
+        return len(self.question_topics)
+
+    def score(self, response_map: Union[Dict, Iterable[Tuple[int, int]]]) -> Dict[str, Any]:
+        """Score a response_map (question id -> chosen option id, or such pairs) in O(answers)"""
+        questions = []
+        topics = {
+            topic: {'topic': topic, 'correct': 0, 'attempted': 0, 'total_questions': count}
+            for topic, count in self.topic_question_counts.items()
+        }
+        correct = incorrect = 0
+
+        responses = response_map.items() if isinstance(response_map, dict) else (response_map or ())
+        for question_id, option_id in responses:
+            entry = self.options.get(int(option_id)) if option_id is not None else None
+            if entry is None or entry[0] != int(question_id):
+                # Option not part of this quiz definition (e.g. quiz edited after the attempt)
+                continue
+            question_id, topic, is_correct = entry
+            questions.append({
+                'question_id': question_id,
+                'option_id': int(option_id),
+                'topic': topic,
+                'is_correct': is_correct
+            })
+            topics[topic]['attempted'] += 1
+            if is_correct:
+                topics[topic]['correct'] += 1
+                correct += 1
+            else:
+                incorrect += 1
+
+        return {
+            'quiz_id': self.quiz_id,
+            'correct_answers': correct,
+            'incorrect_answers': incorrect,
+            'total_questions': self.question_count,
+            'score': correct * self.correct_answer_marks - incorrect * self.negative_marks,
+            'questions': questions,
+            'topics': list(topics.values())
+        }
+
+
+class QuizScorer:
+    """Score submissions against cached QuizIndex objects, one per quiz id and revision"""
+
+    def __init__(self, max_quizzes: int = 256, catalog=None):
+        self.max_quizzes = max_quizzes
+        self.catalog = catalog
+        self._indexes: 'OrderedDict[Tuple[Any, Any], QuizIndex]' = OrderedDict()
+
+    def index_for(self, quiz: Dict) -> QuizIndex:
+        """Return the cached index for a quiz definition, building it on first use"""
+        quiz = unwrap_quiz(quiz)
+        key = (quiz.get('id'), quiz.get('updated_at'))
+        index = self._indexes.get(key)
+        if index is not None:
+            self._indexes.move_to_end(key)
+            return index
+
+        if self.catalog is not None:
+            index = self.catalog.get(*key)
+            if index is None and 'questions' in quiz:
+                index = self.catalog.put(quiz)
+        if index is None:
+            if 'questions' not in quiz:
+                raise KeyError(f"Quiz {key[0]} has no question definitions and is not cached")
+            index = QuizIndex(quiz)
+        self.add_index(index)
+        return index
+
+    def add_index(self, index: QuizIndex):
+        """Register a prebuilt index (e.g. loaded from a quiz catalog)"""
+        self._indexes[(index.quiz_id, index.updated_at)] = index
+        if len(self._indexes) > self.max_quizzes:
+            self._indexes.popitem(last=False)
+
+    def score(self, submission: Union[Dict, SubmissionRecord], quiz: Dict) -> Dict[str, Any]:
+        """Score one submission's response_map against a quiz definition"""
+        return self.index_for(quiz).score(submission_responses(submission))
+
+    def score_many(self, submissions: Iterable[Union[Dict, SubmissionRecord]], quiz: Dict) -> List[Dict[str, Any]]:
+        """Score many attempts at the same quiz, sharing one index"""
+        index = self.index_for(quiz)
+        return [index.score(submission_responses(submission)) for submission in submissions]
+
+
+default_scorer = QuizScorer()
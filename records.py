@@ -0,0 +1,171 @@
+"""Compact, slotted record types built once from the raw JSON exports
+
+Numeric strings ("90 %", "105.0", "15:00") are parsed and timestamps converted to epoch
+seconds at construction time, topics are mapped to their canonical name (see topic_taxonomy),
+and every submission to the same quiz revision shares one QuizRecord, so nothing is re-parsed
+by the analysis code.
+"""
+import re
+from array import array
+from datetime import datetime
+from typing import Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+
+from topic_taxonomy import TopicTaxonomy, default_taxonomy
+
+
+def parse_accuracy(value: Any) -> float:
+    """Parse an accuracy value such as "90 %" into a float"""
+    if isinstance(value, str):
+        return float(value.strip(' %'))
+    return float(value)
+
+
+def parse_float(value: Any) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    return float(value)
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Convert an ISO-8601 timestamp (e.g. "2025-01-17T15:30:18.027+05:30") to epoch seconds"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return datetime.fromisoformat(value).timestamp()
+
+
+def parse_duration(value: Any) -> Optional[int]:
+    """Convert a "MM:SS" or "HH:MM:SS" duration into seconds"""
+    if value is None or isinstance(value, int):
+        return value
+    seconds = 0
+    for part in str(value).split(':'):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+_RANK_PATTERN = re.compile(r'#\s*-?\s*(\d+)')
+
+
+def parse_rank(rank_text: Optional[str]) -> Optional[int]:
+    """Extract the rank from a rank_text such as 'Topic Rank - #-171'"""
+    match = _RANK_PATTERN.search(rank_text) if rank_text else None
+    return int(match.group(1)) if match else None
+
+
+class QuizRecord:
+    """Quiz metadata and marking scheme, without question bodies"""
+    __slots__ = ('id', 'title', 'topic', 'updated_at', 'questions_count', 'correct_answer_marks', 'negative_marks')
+
+    def __init__(self, id: Any, title: str, topic: str, updated_at: str, questions_count: Optional[int],
+                 correct_answer_marks: Optional[float], negative_marks: Optional[float]):
+        self.id = id
+        self.title = title
+        self.topic = topic
+        self.updated_at = updated_at
+        self.questions_count = questions_count
+        self.correct_answer_marks = correct_answer_marks
+        self.negative_marks = negative_marks
+
+    @classmethod
+    def from_dict(cls, quiz: Dict, taxonomy: TopicTaxonomy = None) -> 'QuizRecord':
+        return cls(
+            quiz.get('id'),
+            quiz.get('title'),
+            (taxonomy or default_taxonomy).canonical(quiz.get('topic')),
+            quiz.get('updated_at'),
+            quiz.get('questions_count'),
+            parse_float(quiz.get('correct_answer_marks')),
+            parse_float(quiz.get('negative_marks')),
+        )
+
+
+class QuizInterner:
+    """Share one QuizRecord between all submissions to the same quiz revision"""
+
+    def __init__(self, taxonomy: TopicTaxonomy = None):
+        self.quizzes: Dict[Tuple[Any, Any], QuizRecord] = {}
+        self.taxonomy = taxonomy or default_taxonomy
+
+    def intern(self, quiz: Union[Dict, QuizRecord]) -> QuizRecord:
+        if isinstance(quiz, QuizRecord):
+            key = (quiz.id, quiz.updated_at)
+            return self.quizzes.setdefault(key, quiz)
+        key = (quiz.get('id'), quiz.get('updated_at'))
+        record = self.quizzes.get(key)
+        if record is None:
+            record = self.quizzes[key] = QuizRecord.from_dict(quiz, self.taxonomy)
+        return record
+
+
+class SubmissionRecord:
+    """One quiz attempt with numeric fields pre-parsed"""
+    __slots__ = (
+        'id', 'quiz_id', 'user_id', 'submitted_at', 'score', 'accuracy', 'speed', 'final_score', 'negative_score',
+        'correct_answers', 'incorrect_answers', 'total_questions', 'better_than', 'rank_text', 'duration', 'quiz',
+        'question_ids', 'option_ids',
+    )
+
+    def __init__(self):
+        self.question_ids = None
+        self.option_ids = None
+
+    @classmethod
+    def from_dict(cls, record: Dict, interner: QuizInterner = None, keep_responses: bool = True) -> 'SubmissionRecord':
+        submission = cls()
+        submission.id = record.get('id')
+        submission.quiz_id = record.get('quiz_id')
+        submission.user_id = record.get('user_id')
+        submission.submitted_at = parse_timestamp(record.get('submitted_at'))
+        submission.score = record['score']
+        submission.accuracy = parse_accuracy(record['accuracy'])
+        submission.speed = float(record.get('speed', 0))
+        submission.final_score = parse_float(record.get('final_score'))
+        submission.negative_score = parse_float(record.get('negative_score'))
+        submission.correct_answers = record['correct_answers']
+        submission.incorrect_answers = record.get('incorrect_answers')
+        submission.total_questions = record['total_questions']
+        submission.better_than = record.get('better_than')
+        submission.rank_text = record.get('rank_text')
+        submission.duration = parse_duration(record.get('duration'))
+        quiz = record['quiz']
+        submission.quiz = interner.intern(quiz) if interner is not None else QuizRecord.from_dict(quiz)
+        if submission.quiz_id is None:
+            submission.quiz_id = submission.quiz.id
+
+        response_map = record.get('response_map')
+        if keep_responses and response_map:
+            # Parallel integer arrays: far smaller than a dict with string keys
+            try:
+                submission.question_ids = array('q', map(int, response_map))
+                submission.option_ids = array('q', response_map.values())
+            except TypeError:
+                # Unanswered questions (None) or option ids serialized as strings
+                answered = [(question, option) for question, option in response_map.items() if option is not None]
+                submission.question_ids = array('q', [int(question) for question, _ in answered])
+                submission.option_ids = array('q', [int(option) for _, option in answered])
+        return submission
+
+    @property
+    def topic(self) -> str:
+        return self.quiz.topic
+
+    def responses(self) -> Iterator[Tuple[int, int]]:
+        """(question id, chosen option id) pairs of the attempt"""
+        if self.question_ids is None:
+            return iter(())
+        return zip(self.question_ids, self.option_ids)
+
+
+def as_submission_record(submission: Union[Dict, SubmissionRecord], interner: QuizInterner = None,
+                         keep_responses: bool = True) -> SubmissionRecord:
+    """Return submission as a SubmissionRecord, converting raw JSON dicts"""
+    if isinstance(submission, SubmissionRecord):
+        return submission
+    return SubmissionRecord.from_dict(submission, interner, keep_responses)
+
+
+def as_submission_records(submissions: Iterable[Union[Dict, SubmissionRecord]],
+                          keep_responses: bool = True) -> Iterator[SubmissionRecord]:
+    interner = QuizInterner()
+    for submission in submissions:
+        yield as_submission_record(submission, interner, keep_responses)
@@ -0,0 +1,248 @@
+"""Bulk export of full student reports as gzip-compressed JSON lines or a zip of per-student files
+
+Reports (persona, recommendations, strategies and summary) are rendered and serialized in worker
+processes while a writer thread compresses and writes finished chunks, so computation and I/O
+overlap. Chunks are written in submission order, so the same cohort always produces the same
+file. orjson is used for serialization when it is installed.
+
+    python report_export.py --historical data/XgAgFJ.json --output reports/class.jsonl.gz
+    python report_export.py --snapshot snapshots/latest --output reports/class.zip --workers 8
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Iterable, Optional, Tuple, Union
+
+from cohort_analysis import CohortAnalyzer
+from peer_index import PercentileIndex
+from similar_students import SimilarStudentIndex
+from student_recommendations import PerformanceAggregates, StudentAnalyzer
+from reports import build_report
+from worker_state import cohort_indexes, init_worker
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+GZIP_LEVEL = 6
+
+
+def dumps(value: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON, with orjson when available"""
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        return orjson.dumps(value, option=options | orjson.OPT_INDENT_2 if indent else options)
+    if indent:
+        return json.dumps(value, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def export_format(path: str) -> str:
+    return 'zip' if path.endswith('.zip') else 'jsonl.gz'
+
+
+class JsonLinesGzipSink:
+    """One report per line of a gzip-compressed JSON-lines file"""
+
+    def __init__(self, path: str, compresslevel: int = GZIP_LEVEL):
+        self._file = gzip.open(path, 'wb', compresslevel=compresslevel)
+
+    def write(self, reports: List[Tuple[str, bytes]]):
+        self._file.write(b''.join(report + b'\n' for _, report in reports))
+
+    def close(self):
+        self._file.close()
+
+
+class ZipSink:
+    """One deflated <user_id>.json file per report in a zip archive"""
+
+    def __init__(self, path: str, compresslevel: int = GZIP_LEVEL):
+        self._file = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+
+    def write(self, reports: List[Tuple[str, bytes]]):
+        for user_id, report in reports:
+            self._file.writestr(f"{user_id}.json", report)
+
+    def close(self):
+        self._file.close()
+
+
+def render_chunk(students: List[Tuple[str, PerformanceAggregates]], peers: PercentileIndex = None,
+                 similar: SimilarStudentIndex = None) -> List[Tuple[str, bytes]]:
+    """Build and serialize the reports of a chunk of students; runs inside a worker"""
+    peers, similar = cohort_indexes(peers, similar)
+    rendered = []
+    for user_id, aggregates in students:
+        analyzer = StudentAnalyzer(peers=peers, similar=similar)
+        analyzer.load_aggregates(aggregates, user_id=user_id)
+        rendered.append((user_id, dumps({'user_id': user_id, **build_report(analyzer)})))
+    return rendered
+
+
+def _chunks(cohort: CohortAnalyzer, user_ids: Iterable[str], chunk_size: int) -> Iterable[List[Tuple[str, Any]]]:
+    chunk = []
+    for user_id in user_ids:
+        chunk.append((user_id, cohort.aggregates[user_id]))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def export_reports(cohort: CohortAnalyzer, path: str, user_ids: Iterable[str] = None, workers: int = None,
+                         chunk_size: int = 64, compresslevel: int = GZIP_LEVEL,
+                         progress: Callable[[int], None] = None) -> Dict[str, Any]:
+    """Write the reports of a cohort's students (default: all) to path (.zip, otherwise .jsonl.gz)
+
+    workers > 1 renders in a process pool; workers == 1 renders in one background thread.
+    progress, if given, is called with the number of reports written after each chunk.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    user_ids = list(cohort.aggregates) if user_ids is None else list(user_ids)
+    # Peer percentiles and similar students come from the whole cohort
+    peers, similar = cohort.peers, cohort.similar
+    sink_type = ZipSink if export_format(path) == 'zip' else JsonLinesGzipSink
+
+    loop = asyncio.get_running_loop()
+    if workers == 1:
+        executor: Executor = ThreadPoolExecutor(1, initializer=init_worker, initargs=(peers, similar))
+    else:
+        executor = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(peers, similar))
+    # Finished chunks wait here for the writer; the bound keeps memory flat when the disk is slower
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    written = 0
+    # The sink.write running in the default executor, if any; cancelling the writer does not stop it
+    in_flight: Optional[asyncio.Future] = None
+
+    async def write_all(sink):
+        nonlocal written, in_flight
+        error = None
+        while True:
+            reports = await queue.get()
+            if reports is None:
+                break
+            if error is not None:
+                # Keep draining so the producer never blocks on a full queue
+                continue
+            try:
+                # gzip/zlib release the GIL, so compression overlaps with rendering
+                in_flight = loop.run_in_executor(None, sink.write, reports)
+                await asyncio.shield(in_flight)
+            except Exception as failure:
+                error = failure
+                continue
+            written += len(reports)
+            if progress is not None:
+                progress(written)
+        if error is not None:
+            raise error
+
+    sink = sink_type(path + '.tmp', compresslevel)
+    writer = asyncio.create_task(write_all(sink))
+    try:
+        with executor:
+            pending = deque()
+            for chunk in _chunks(cohort, user_ids, chunk_size):
+                pending.append(loop.run_in_executor(executor, render_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    await queue.put(await pending.popleft())
+            while pending:
+                await queue.put(await pending.popleft())
+        await queue.put(None)
+        await writer
+    except BaseException:
+        writer.cancel()
+        await asyncio.gather(writer, return_exceptions=True)
+        if in_flight is not None:
+            # Let a write already in progress finish before its file is closed underneath it
+            await asyncio.gather(in_flight, return_exceptions=True)
+        sink.close()
+        os.remove(path + '.tmp')
+        raise
+    sink.close()
+    os.replace(path + '.tmp', path)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'students': written,
+        'output': path,
+        'bytes': os.path.getsize(path),
+        'seconds': round(elapsed, 3),
+        'students_per_second': round(written / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def export_cohort(cohort: CohortAnalyzer, path: str, **options) -> Dict[str, Any]:
+    """Blocking wrapper around export_reports"""
+    return asyncio.run(export_reports(cohort, path, **options))
+
+
+class BackgroundExport:
+    """Run export_cohort in a daemon thread and expose its progress, e.g. to poll from the dashboard
+
+    cohort may also be a zero-argument callable returning one, so loading happens off the caller's thread.
+    """
+
+    def __init__(self, cohort: Union[CohortAnalyzer, Callable[[], CohortAnalyzer]], path: str, **options):
+        self.path = path
+        self.total: Optional[int] = None
+        self.written = 0
+        self.stats: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, args=(cohort, options), daemon=True)
+        self._thread.start()
+
+    def _run(self, cohort: Union[CohortAnalyzer, Callable[[], CohortAnalyzer]], options: Dict[str, Any]):
+        try:
+            if callable(cohort):
+                cohort = cohort()
+            self.total = len(cohort.aggregates)
+            self.stats = export_cohort(cohort, self.path, progress=self._progress, **options)
+        except Exception as error:
+            self.error = error
+
+    def _progress(self, written: int):
+        self.written = written
+
+    @property
+    def done(self) -> bool:
+        return not self._thread.is_alive()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Export full reports for every student of a cohort")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--historical', nargs='+', help="Submission exports (JSON array or JSON lines)")
+    source.add_argument('--snapshot', help="Cohort snapshot written by cohort_snapshot.py")
+    parser.add_argument('--output', required=True, help="Output file: .zip for per-student files, otherwise .jsonl.gz")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=64, help="Students rendered per task")
+    parser.add_argument('--compresslevel', type=int, default=GZIP_LEVEL)
+    args = parser.parse_args(argv)
+
+    if args.snapshot:
+        from cohort_snapshot import CohortSnapshot
+        cohort = CohortSnapshot(args.snapshot).cohort()
+    else:
+        from submission_stream import load_cohort
+        cohort = load_cohort(*args.historical)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    stats = export_cohort(cohort, args.output, workers=args.workers, chunk_size=args.chunk_size,
+                          compresslevel=args.compresslevel)
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
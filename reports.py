@@ -0,0 +1,78 @@
+from typing import Dict, Any
+
+from student_recommendations import StudentAnalyzer
+
+
+def generate_strategies(data: dict) -> list:
+    """Generate improvement strategies based on student data"""
+    learning_style = data['persona']['learning_style']
+    performance_level = data['persona']['performance_level']
+    
+    # Pre-defined strategies based on learning style and performance level
+    strategies = {
+        "Fast and Accurate": [
+            "Challenge yourself with advanced problem sets in your weak areas",
+            "Create study materials to teach concepts to peers",
+            "Focus on time management to maintain high accuracy"
+        ],
+        "Quick but Needs More Practice": [
+            "Slow down and double-check your work before submitting",
+            "Practice with mixed difficulty questions to build confidence",
+            "Focus on understanding core concepts before moving to advanced topics"
+        ],
+        "Methodical and Accurate": [
+            "Gradually increase your speed while maintaining accuracy",
+            "Take timed practice tests to improve efficiency",
+            "Focus on pattern recognition in similar problems"
+        ],
+        "Building Foundations": [
+            "Start with basic concepts and gradually increase difficulty",
+            "Break down complex topics into smaller, manageable parts",
+            "Regular practice with immediate feedback"
+        ]
+    }
+    
+    # Get strategies based on learning style
+    base_strategies = strategies.get(learning_style, strategies["Building Foundations"])
+    
+    # Add performance-specific strategy
+    if performance_level == "High Achiever":
+        base_strategies.append("Focus on maintaining consistency while tackling more challenging content")
+    elif performance_level == "Average Performer":
+        base_strategies.append("Identify and focus on specific areas where improvement is needed")
+    else:
+        base_strategies.append("Build a strong foundation in core concepts through regular practice")
+    
+    return base_strategies[:3]  # Return top 3 strategies
+
+
+def generate_summary(data: dict) -> str:
+    """Generate a summary of student performance"""
+    learning_style = data['persona']['learning_style']
+    performance_level = data['persona']['performance_level']
+    strengths = ', '.join(data['persona']['strength_areas'])
+    weak_areas = ', '.join([area['topic'] for area in data['persona']['improvement_needed']])
+    consistency = data['persona']['consistency_score']
+    
+    summary = f"""
+    This student demonstrates a {learning_style.lower()} learning approach, performing at an {performance_level.lower()} level 
+    with a consistency score of {consistency}%. Their key strengths lie in {strengths}. 
+    However, they should focus on improving in {weak_areas}. 
+    
+    Based on their learning pattern, they would benefit from a structured approach that combines 
+    their quick learning ability with more thorough practice sessions. The student shows potential 
+    for improvement, particularly if they focus on building stronger foundations in their weak areas 
+    while maintaining their current strengths.
+    """
+    return summary.strip()
+
+
+def build_report(analyzer: StudentAnalyzer) -> Dict[str, Any]:
+    """Build the full report for a loaded analyzer: persona, recommendations, strategies and summary"""
+    data = {
+        'persona': analyzer.generate_student_persona(),
+        'recommendations': analyzer.generate_recommendations()
+    }
+    data['strategies'] = generate_strategies(data)
+    data['summary'] = generate_summary(data)
+    return data
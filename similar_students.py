@@ -0,0 +1,248 @@
+"""Nearest-neighbour index of students for "students like you" recommendations
+
+Each student is a vector of per-topic accuracy plus overall accuracy and speed (all scaled to
+0-1). Small cohorts are searched exactly; once the cohort passes exact_limit students an
+inverted-file index (k-means lists, probing the closest few) keeps queries sub-millisecond.
+Inserts and updates are incremental; the lists are retrained when the cohort doubles.
+"""
+from array import array
+from typing import Dict, List, Any, MutableSequence, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from student_recommendations import PerformanceAggregates
+
+EXACT_LIMIT = 10000
+N_PROBE = 8
+KMEANS_ITERATIONS = 10
+ASSIGN_CHUNK = 8192
+TIE_TOLERANCE = 1e-4
+MIN_TOPIC_ATTEMPTS = 2
+
+
+def topic_improvements(aggregates: 'PerformanceAggregates') -> Dict[str, float]:
+    """Score change from the first to the latest attempt, for topics attempted at least twice"""
+    return {
+        topic: float(scores[-1]) - float(scores[0])
+        for topic, scores in aggregates.topic_scores.items()
+        if len(scores) >= MIN_TOPIC_ATTEMPTS
+    }
+
+
+class SimilarStudentIndex:
+    """Student vectors with exact or approximate (inverted-file) nearest-neighbour search"""
+
+    def __init__(self, exact_limit: int = EXACT_LIMIT, n_probe: int = N_PROBE, seed: int = 0):
+        self.exact_limit = exact_limit
+        self.n_probe = n_probe
+        self.topics: Dict[str, int] = {}
+        self.user_ids: List[Any] = []
+        self.improvements: MutableSequence[Dict[str, float]] = []
+        self._rows: Dict[Any, int] = {}
+        self._vectors = np.zeros((0, 2), dtype=np.float32)
+        self._squared_norms = np.zeros(0, dtype=np.float32)
+        self._rng = np.random.default_rng(seed)
+        # Inverted lists: centroids, row ids per list and the list of every row
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[array] = []
+        self._assignment = array('q')
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    @classmethod
+    def build(cls, aggregates: Dict[Any, 'PerformanceAggregates'], **options) -> 'SimilarStudentIndex':
+        index = cls(**options)
+        for user_id, student in aggregates.items():
+            index.upsert(user_id, student)
+        return index
+
+    @classmethod
+    def from_vectors(cls, user_ids: List[Any], topics: List[str], vectors: np.ndarray,
+                     improvements: MutableSequence[Dict[str, float]], centroids: np.ndarray = None,
+                     assignment: np.ndarray = None, **options) -> 'SimilarStudentIndex':
+        """Index over precomputed student vectors, e.g. memory-mapped from a cohort snapshot
+
+        vectors has one row per user id and columns as in vector() for topics in the given order;
+        improvements is indexed by row and only read for the neighbours of a query. centroids and
+        assignment restore trained inverted lists; without them a large cohort is trained here.
+        """
+        index = cls(**options)
+        index.user_ids = list(user_ids)
+        index.topics = {topic: column + 2 for column, topic in enumerate(topics)}
+        index.improvements = improvements
+        index._rows = {user_id: row for row, user_id in enumerate(index.user_ids)}
+        index._vectors = vectors
+        index._squared_norms = np.einsum('ij,ij->i', vectors, vectors)
+        if centroids is not None:
+            index._set_lists(np.array(centroids), np.asarray(assignment))
+        elif len(index.user_ids) > index.exact_limit:
+            index._train()
+        return index
+
+    @property
+    def dimensions(self) -> int:
+        return 2 + len(self.topics)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """One row per user id, in the order of user_ids"""
+        return self._vectors[:len(self.user_ids)]
+
+    @property
+    def inverted_lists(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(centroids, list of every row) once the index is trained, else None"""
+        if self._centroids is None:
+            return None
+        return self._centroids, np.frombuffer(self._assignment, dtype=np.int64)
+
+    def vector(self, aggregates: 'PerformanceAggregates', grow: bool = False) -> np.ndarray:
+        """Overall accuracy, speed and per-topic accuracy of a student; unknown topics are skipped unless grow"""
+        if grow:
+            for topic in aggregates.topic_total:
+                self.topics.setdefault(topic, len(self.topics) + 2)
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        vector[0] = aggregates.average_accuracy / 100
+        vector[1] = aggregates.average_speed / 100
+        for topic, column in aggregates.topic_accuracy().items():
+            dimension = self.topics.get(topic)
+            if dimension is not None:
+                vector[dimension] = column / 100
+        return vector
+
+    def _ensure_shape(self, rows: int):
+        capacity, width = self._vectors.shape
+        if width < self.dimensions:
+            self._vectors = np.pad(self._vectors, ((0, 0), (0, self.dimensions - width)))
+            if self._centroids is not None:
+                self._centroids = np.pad(self._centroids, ((0, 0), (0, self.dimensions - width)))
+        if capacity < rows:
+            grow_by = max(rows, capacity * 2) - capacity
+            self._vectors = np.pad(self._vectors, ((0, grow_by), (0, 0)))
+            self._squared_norms = np.pad(self._squared_norms, (0, grow_by))
+
+    def upsert(self, user_id: Any, aggregates: 'PerformanceAggregates'):
+        """Insert a student or refresh their vector after new submissions"""
+        vector = self.vector(aggregates, grow=True)
+        row = self._rows.get(user_id)
+        if row is None:
+            row = self._rows[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+            self.improvements.append({})
+        self._ensure_shape(len(self.user_ids))
+        self._vectors[row] = vector
+        self._squared_norms[row] = vector @ vector
+        self.improvements[row] = topic_improvements(aggregates)
+
+        if self._centroids is None:
+            if len(self.user_ids) > self.exact_limit:
+                self._train()
+            return
+        if len(self.user_ids) >= 2 * self._trained_size:
+            self._train()
+            return
+        nearest = int(self._nearest_lists(vector, 1)[0])
+        if row < len(self._assignment):
+            if self._assignment[row] == nearest:
+                return
+            self._lists[self._assignment[row]].remove(row)
+            self._assignment[row] = nearest
+        else:
+            self._assignment.append(nearest)
+        self._lists[nearest].append(row)
+
+    def _train(self):
+        """Cluster the vectors with k-means into about sqrt(n) inverted lists"""
+        vectors = self._vectors[:len(self.user_ids)]
+        n_lists = max(int(np.sqrt(len(vectors))), 1)
+        centroids = vectors[self._rng.choice(len(vectors), n_lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = self._assign(vectors, centroids)
+            counts = np.bincount(assignment, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, vectors)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        self._set_lists(centroids, self._assign(vectors, centroids))
+
+    def _set_lists(self, centroids: np.ndarray, assignment: np.ndarray):
+        self._centroids = centroids
+        self._assignment = array('q', assignment.tolist())
+        order = np.argsort(assignment, kind='stable')
+        boundaries = np.cumsum(np.bincount(assignment, minlength=len(centroids)))[:-1]
+        self._lists = [array('q', rows.tolist()) for rows in np.split(order, boundaries)]
+        self._trained_size = len(assignment)
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # ||v - c||^2 = ||v||^2 - 2 v.c + ||c||^2; ||v||^2 does not change the argmin
+        squared_norms = (centroids ** 2).sum(axis=1)
+        return np.concatenate([
+            (squared_norms - 2 * vectors[start:start + ASSIGN_CHUNK] @ centroids.T).argmin(axis=1)
+            for start in range(0, len(vectors), ASSIGN_CHUNK)
+        ])
+
+    def _nearest_lists(self, vector: np.ndarray, count: int) -> np.ndarray:
+        distances = ((self._centroids - vector) ** 2).sum(axis=1)
+        if count >= len(distances):
+            return np.arange(len(distances))
+        return np.argpartition(distances, count - 1)[:count]
+
+    def nearest(self, vector: np.ndarray, k: int = 10, exclude: Any = None) -> List[Tuple[Any, float]]:
+        """Up to k (user_id, distance) pairs closest to vector, nearest first"""
+        if not self.user_ids:
+            return []
+        if self._centroids is None:
+            candidates = None
+            vectors = self._vectors[:len(self.user_ids)]
+            squared_norms = self._squared_norms[:len(self.user_ids)]
+        else:
+            probed = [self._lists[index] for index in self._nearest_lists(vector, self.n_probe)]
+            probed = [np.frombuffer(rows, dtype=np.int64) for rows in probed if len(rows)]
+            if not probed:
+                return []
+            candidates = np.concatenate(probed)
+            vectors = self._vectors[candidates]
+            squared_norms = self._squared_norms[candidates]
+        # ||v - q||^2 from the stored squared norms: one matrix-vector product per query
+        distances = squared_norms - 2 * (vectors @ vector) + vector @ vector
+        count = min(k + 1, len(distances))
+        cutoff = np.partition(distances, count - 1)[count - 1]
+        # Keep everything within rounding error of the k-th distance, then rank those exactly, breaking
+        # ties by user id so the result does not depend on insertion order
+        closest = np.flatnonzero(distances <= cutoff + TIE_TOLERANCE)
+        exact = ((vectors[closest].astype(np.float64) - vector) ** 2).sum(axis=1)
+        rows = closest if candidates is None else candidates[closest]
+
+        neighbours = [
+            (self.user_ids[row], round(float(np.sqrt(distance)), 6))
+            for row, distance in zip(rows.tolist(), exact.tolist())
+            if self.user_ids[row] != exclude
+        ]
+        neighbours.sort(key=lambda neighbour: (neighbour[1], str(neighbour[0])))
+        return neighbours[:k]
+
+    def recommend(self, aggregates: 'PerformanceAggregates', user_id: Any = None, k: int = 10,
+                  limit: int = 3) -> Dict[str, Any]:
+        """Topics that the k most similar students improved on and this student has not mastered"""
+        neighbours = self.nearest(self.vector(aggregates), k, exclude=user_id)
+        accuracy = aggregates.topic_accuracy()
+        gains: Dict[str, List[float]] = {}
+        for neighbour, _ in neighbours:
+            for topic, improvement in self.improvements[self._rows[neighbour]].items():
+                if improvement > 0 and accuracy.get(topic, 0) < 80:
+                    gains.setdefault(topic, []).append(improvement)
+        topics = sorted(gains.items(), key=lambda item: (-len(item[1]), -sum(item[1]) / len(item[1])))
+        return {
+            'similar_students': [neighbour for neighbour, _ in neighbours],
+            'topics': [
+                {
+                    'topic': topic,
+                    'improved_students': len(improvements),
+                    'average_improvement': round(sum(improvements) / len(improvements), 2)
+                }
+                for topic, improvements in topics[:limit]
+            ]
+        }
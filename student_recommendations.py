@@ -1,94 +1,492 @@
 import json
-import pandas as pd
+import heapq
+import numpy as np
+from bisect import bisect_left
 from datetime import datetime
-from typing import Dict, List, Any
+from itertools import accumulate, islice
+from typing import Dict, List, Any, Optional, Set, Tuple, Union, TYPE_CHECKING
 from collections import defaultdict
 
-class StudentAnalyzer:
+from peer_index import PercentileIndex, correct_rate
+from question_difficulty import DifficultyCalibrator, difficulty_level
+from similar_students import SimilarStudentIndex
+from quiz_scoring import QuizScorer, default_scorer, submission_responses
+from records import SubmissionRecord, as_submission_record, as_submission_records, parse_rank
+from topic_taxonomy import default_taxonomy
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from submission_store import SubmissionStore
+
+SUBMISSION_COLUMNS = ['user_id', 'topic', 'score', 'accuracy', 'speed', 'correct_answers', 'total_questions', 'submitted_at',
+                      'quiz_id']
+
+RECENT_ATTEMPTS = 10  # rolling window over the last N attempts
+RECENT_DAYS = 30  # rolling window over the last K days before the latest attempt
+RECENCY_HALF_LIFE_DAYS = 30  # an attempt this old counts half as much in the weighted topic accuracy
+# Fixed reference time for the decay weights; weighted averages do not depend on it, but a fixed
+# reference makes every weight independent of the other attempts, so sums can be added and merged
+RECENCY_EPOCH = 1704067200.0  # 2024-01-01T00:00:00Z
+SECONDS_PER_DAY = 86400
+
+# With a peer index, topics in the bottom quarter of peer attempts are weak below 80% accuracy,
+# and topics in the top decile count as strengths from 70% accuracy
+PEER_WEAK_PERCENTILE = 25
+PEER_STRENGTH_PERCENTILE = 90
+
+# Share of practice questions a student should get right: easier sets below 50% topic accuracy
+FOUNDATION_SUCCESS_RATE = 0.75
+ADVANCED_SUCCESS_RATE = 0.5
+
+
+def recency_weights(submitted_at: np.ndarray) -> np.ndarray:
+    """Exponential decay weights (half-life RECENCY_HALF_LIFE_DAYS) for epoch-second timestamps"""
+    return np.exp2((submitted_at - RECENCY_EPOCH) / (RECENCY_HALF_LIFE_DAYS * SECONDS_PER_DAY))
+
+
+def submission_values(quiz: SubmissionRecord) -> Tuple:
+    """Extract the analyzed fields of one submission, in SUBMISSION_COLUMNS order"""
+    return (
+        quiz.user_id,
+        quiz.quiz.topic,
+        quiz.score,
+        quiz.accuracy,
+        quiz.speed,
+        quiz.correct_answers,
+        quiz.total_questions,
+        quiz.submitted_at,
+        quiz.quiz_id,
+    )
+
+
+def normalize_submissions(historical_data: List[Union[Dict, SubmissionRecord]]) -> 'pd.DataFrame':
+    """Normalize submission records (raw dicts or SubmissionRecord) into a chronologically sorted columnar table
+
+    Rows are stably sorted by submitted_at, so each student's attempts are in time order. Attempts
+    without a timestamp are placed after the student's latest timestamped attempt.
+    """
+    # pandas is imported on first use so importing this module stays cheap (e.g. dashboard cold start)
+    import pandas as pd
+
+    columns = {name: [] for name in SUBMISSION_COLUMNS}
+    column_lists = [columns[name] for name in SUBMISSION_COLUMNS]
+    for quiz in as_submission_records(historical_data, keep_responses=False):
+        for column, value in zip(column_lists, submission_values(quiz)):
+            column.append(value)
+
+    frame = pd.DataFrame({
+        'user_id': pd.Series(columns['user_id'], dtype=object),
+        'topic': pd.Series(columns['topic'], dtype=object),
+        'score': pd.Series(columns['score'], dtype=object),
+        'accuracy': np.asarray(columns['accuracy'], dtype=np.float64),
+        'speed': np.asarray(columns['speed'], dtype=np.float64),
+        'correct_answers': np.asarray(columns['correct_answers'], dtype=np.int64),
+        'total_questions': np.asarray(columns['total_questions'], dtype=np.int64),
+        'submitted_at': np.asarray(columns['submitted_at'], dtype=np.float64),
+        'quiz_id': pd.Series(columns['quiz_id'], dtype=object),
+        # Dense integer topic ids (-1 without a topic) for the per-topic group-bys
+        'topic_id': np.asarray(default_taxonomy.codes(columns['topic']), dtype=np.int64),
+    })
+    frame = frame.sort_values('submitted_at', kind='stable', na_position='last', ignore_index=True)
+    if frame['submitted_at'].isna().any():
+        frame['submitted_at'] = (
+            frame.groupby('user_id', sort=False, dropna=False)['submitted_at'].ffill().fillna(RECENCY_EPOCH)
+        )
+    return frame
+
+
+class PerformanceAggregates:
+    """Precomputed per-student statistics that the persona and recommendation rules read from"""
+
     def __init__(self):
+        self.count = 0
+        self.score_sum = 0.0
+        self.score_m2 = 0.0
+        self.speed_sum = 0.0
+        self.accuracy_sum = 0.0
+        self.accuracy_trend: List[float] = []
+        self.topic_scores: Dict[str, List] = {}
+        self.topic_correct: Dict[str, int] = {}
+        self.topic_total: Dict[str, int] = {}
+        # Chronological attempt times (parallel to accuracy_trend and topic_scores) and running accuracy sums
+        self.attempt_times: List[float] = []
+        self.topic_times: Dict[str, List[float]] = {}
+        self.accuracy_prefix: List[float] = [0.0]
+        # Recency-weighted (exponential decay) correct/total counts per topic
+        self.topic_weighted_correct: Dict[str, float] = {}
+        self.topic_weighted_total: Dict[str, float] = {}
+
+    @classmethod
+    def from_frame(cls, frame: 'pd.DataFrame') -> 'PerformanceAggregates':
+        """Compute all aggregates from a normalized submission table"""
+        import pandas as pd
+
+        aggregates = cls()
+        aggregates.count = len(frame)
+        if not aggregates.count:
+            return aggregates
+
+        scores = frame['score'].to_numpy(dtype=np.float64)
+        aggregates.score_sum = float(scores.sum())
+        aggregates.score_m2 = float(((scores - aggregates.score_mean) ** 2).sum())
+        aggregates.speed_sum = float(frame['speed'].sum())
+        aggregates.accuracy_sum = float(frame['accuracy'].sum())
+        aggregates.accuracy_trend = frame['accuracy'].tolist()
+        aggregates.attempt_times = frame['submitted_at'].tolist()
+        aggregates.accuracy_prefix = [0.0] + np.cumsum(frame['accuracy'].to_numpy()).tolist()
+
+        weights = recency_weights(frame['submitted_at'].to_numpy())
+        weighted = pd.DataFrame({
+            'correct': weights * frame['correct_answers'].to_numpy(),
+            'total': weights * frame['total_questions'].to_numpy(),
+        })
+        weighted_totals = weighted.groupby(frame['topic_id'].to_numpy(), sort=False).sum()
+
+        # Group by the integer topic ids and key the results by canonical topic name
+        by_topic = frame.groupby('topic_id', sort=False)
+        totals = by_topic[['correct_answers', 'total_questions']].sum()
+        topics = [default_taxonomy.name(code) for code in totals.index]
+        aggregates.topic_scores = dict(zip(topics, by_topic['score'].agg(list)))
+        aggregates.topic_times = dict(zip(topics, by_topic['submitted_at'].agg(list)))
+        aggregates.topic_correct = {topic: int(value) for topic, value in zip(topics, totals['correct_answers'])}
+        aggregates.topic_total = {topic: int(value) for topic, value in zip(topics, totals['total_questions'])}
+        aggregates.topic_weighted_correct = dict(zip(topics, weighted_totals['correct'].tolist()))
+        aggregates.topic_weighted_total = dict(zip(topics, weighted_totals['total'].tolist()))
+        return aggregates
+
+    @property
+    def score_mean(self) -> float:
+        return self.score_sum / self.count if self.count else 0.0
+
+    @property
+    def average_score(self) -> float:
+        return self.score_mean
+
+    @property
+    def average_speed(self) -> float:
+        return self.speed_sum / self.count if self.count else 0.0
+
+    @property
+    def average_accuracy(self) -> float:
+        return self.accuracy_sum / self.count if self.count else 0.0
+
+    @property
+    def score_std(self) -> float:
+        return (self.score_m2 / self.count) ** 0.5 if self.count else 0.0
+
+    @property
+    def improvement_rate(self) -> float:
+        if len(self.accuracy_trend) < 2 or not self.accuracy_trend[0]:
+            return 0
+        initial = self.accuracy_trend[0]
+        final = self.accuracy_trend[-1]
+        return ((final - initial) / initial) * 100
+
+    def topic_accuracy(self) -> Dict[str, float]:
+        """Accuracy percentage per topic, in order of first appearance"""
+        return {
+            topic: correct_rate(self.topic_correct[topic], total)
+            for topic, total in self.topic_total.items()
+        }
+
+    def weighted_topic_accuracy(self) -> Dict[str, float]:
+        """Accuracy percentage per topic with attempts weighted by exponential recency decay"""
+        return {
+            topic: (self.topic_weighted_correct[topic] / total) * 100
+            for topic, total in self.topic_weighted_total.items()
+            if total
+        }
+
+    def _window(self, start: int) -> Dict[str, Any]:
+        attempts = len(self.accuracy_trend) - start
+        total = self.accuracy_prefix[-1] - self.accuracy_prefix[start]
+        return {
+            'attempts': attempts,
+            'average_accuracy': total / attempts if attempts else 0.0
+        }
+
+    def recent_attempts(self, attempts: int = RECENT_ATTEMPTS) -> Dict[str, Any]:
+        """Accuracy over the last N attempts, in O(1) from the running accuracy sums"""
+        return self._window(max(len(self.accuracy_trend) - attempts, 0))
+
+    def recent_days(self, days: float = RECENT_DAYS) -> Dict[str, Any]:
+        """Accuracy over the K days up to the latest attempt, in O(log n)"""
+        if not self.attempt_times:
+            return {'days': days, **self._window(0)}
+        cutoff = self.attempt_times[-1] - days * SECONDS_PER_DAY
+        return {'days': days, **self._window(bisect_left(self.attempt_times, cutoff))}
+
+    def _extend_attempts(self, times: List[float], accuracies: List[float]):
+        """Add chronologically sorted attempts, keeping the history in time order"""
+        if not times:
+            return
+        if not self.attempt_times or times[0] >= self.attempt_times[-1]:
+            # Common case: newer attempts arrive last, so the running sums are only appended to
+            self.attempt_times.extend(times)
+            self.accuracy_trend.extend(accuracies)
+            self.accuracy_prefix.extend(islice(accumulate(accuracies, initial=self.accuracy_prefix[-1]), 1, None))
+            return
+        merged = list(heapq.merge(
+            zip(self.attempt_times, self.accuracy_trend), zip(times, accuracies), key=lambda attempt: attempt[0]
+        ))
+        self.attempt_times = [attempt[0] for attempt in merged]
+        self.accuracy_trend = [attempt[1] for attempt in merged]
+        self.accuracy_prefix = list(accumulate(self.accuracy_trend, initial=0.0))
+
+    def _extend_topic(self, topic: str, times: List[float], scores: List) -> bool:
+        """Add chronologically sorted attempts of one topic; True if the topic order may need restoring"""
+        topic_times = self.topic_times.get(topic)
+        if topic_times is None:
+            self.topic_times[topic] = list(times)
+            self.topic_scores[topic] = list(scores)
+            return True
+        if times[0] >= topic_times[-1]:
+            topic_times.extend(times)
+            self.topic_scores[topic].extend(scores)
+            return False
+        merged = list(heapq.merge(zip(topic_times, self.topic_scores[topic]), zip(times, scores),
+                                  key=lambda attempt: attempt[0]))
+        self.topic_times[topic] = [attempt[0] for attempt in merged]
+        self.topic_scores[topic] = [attempt[1] for attempt in merged]
+        return times[0] < topic_times[0]
+
+    def _order_topics(self):
+        """Keep topics in order of their first attempt, as a single pass over the sorted history lists them"""
+        first_times = [times[0] for times in self.topic_times.values()]
+        if all(earlier <= later for earlier, later in zip(first_times, first_times[1:])):
+            return
+        order = sorted(self.topic_times, key=lambda topic: self.topic_times[topic][0])
+        for name in ('topic_times', 'topic_scores', 'topic_correct', 'topic_total',
+                     'topic_weighted_correct', 'topic_weighted_total'):
+            values = getattr(self, name)
+            setattr(self, name, {topic: values[topic] for topic in order})
+
+    def add(self, submission: Union[Dict, SubmissionRecord]) -> 'PerformanceAggregates':
+        """Apply a single new submission in O(1) (Welford update of the score variance)
+
+        An attempt older than the latest one already seen is inserted in time order, which
+        rebuilds the running accuracy sums.
+        """
+        _, topic, score, accuracy, speed, correct, total, submitted_at, _ = submission_values(
+            as_submission_record(submission, keep_responses=False)
+        )
+        if submitted_at is None:
+            submitted_at = self.attempt_times[-1] if self.attempt_times else RECENCY_EPOCH
+        previous_mean = self.score_mean
+        self.count += 1
+        self.score_sum += float(score)
+        self.score_m2 += (float(score) - previous_mean) * (float(score) - self.score_mean)
+        self.speed_sum += speed
+        self.accuracy_sum += accuracy
+        self._extend_attempts([submitted_at], [accuracy])
+        self.topic_total[topic] = self.topic_total.get(topic, 0) + total
+        self.topic_correct[topic] = self.topic_correct.get(topic, 0) + correct
+        reorder = self._extend_topic(topic, [submitted_at], [score])
+        weight = float(recency_weights(np.float64(submitted_at)))
+        self.topic_weighted_total[topic] = self.topic_weighted_total.get(topic, 0.0) + weight * total
+        self.topic_weighted_correct[topic] = self.topic_weighted_correct.get(topic, 0.0) + weight * correct
+        if reorder:
+            self._order_topics()
+        return self
+
+    def merge(self, other: 'PerformanceAggregates') -> 'PerformanceAggregates':
+        """Fold the aggregates of later submissions into this one (parallel variance update)"""
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.score_mean - self.score_mean
+        self.score_m2 += other.score_m2 + delta ** 2 * self.count * other.count / count
+        self.score_sum += other.score_sum
+        self.count = count
+        self.speed_sum += other.speed_sum
+        self.accuracy_sum += other.accuracy_sum
+        self._extend_attempts(other.attempt_times, other.accuracy_trend)
+        reorder = False
+        for topic, total in other.topic_total.items():
+            self.topic_total[topic] = self.topic_total.get(topic, 0) + total
+            self.topic_correct[topic] = self.topic_correct.get(topic, 0) + other.topic_correct[topic]
+            reorder = self._extend_topic(topic, other.topic_times[topic], other.topic_scores[topic]) or reorder
+        for topic, total in other.topic_weighted_total.items():
+            self.topic_weighted_total[topic] = self.topic_weighted_total.get(topic, 0.0) + total
+            self.topic_weighted_correct[topic] = (
+                self.topic_weighted_correct.get(topic, 0.0) + other.topic_weighted_correct[topic]
+            )
+        if reorder:
+            self._order_topics()
+        return self
+
+
+class StudentAnalyzer:
+    def __init__(self, scorer: QuizScorer = None, peers: PercentileIndex = None,
+                 difficulty: DifficultyCalibrator = None, similar: SimilarStudentIndex = None):
         self.historical_data = []
         self.current_quiz = None
         self.quiz_submission = None
+        self.current_results = None
+        self.scorer = scorer or default_scorer
+        self.submissions = None
+        self.aggregates = PerformanceAggregates()
+        self.peers = peers
+        self.difficulty = difficulty
+        self.similar = similar
+        self.user_id = None
         
-    def load_data(self, historical_data: List[Dict], current_quiz: Dict, quiz_submission: Dict):
+    def load_data(self, historical_data: List[Union[Dict, SubmissionRecord]], current_quiz: Dict, quiz_submission: Dict):
         """Load and initialize the data"""
-        self.historical_data = historical_data
+        self.historical_data = list(as_submission_records(historical_data, keep_responses=False))
+        self.user_id = self.historical_data[0].user_id if self.historical_data else None
         self.current_quiz = current_quiz
         self.quiz_submission = quiz_submission
+        self.submissions = normalize_submissions(self.historical_data)
+        self.aggregates = PerformanceAggregates.from_frame(self.submissions)
+        self.current_results = self.score_current_quiz()
+
+    def load_aggregates(self, aggregates: PerformanceAggregates, current_quiz: Dict = None, quiz_submission: Dict = None,
+                        user_id: str = None):
+        """Initialize from aggregates that were computed elsewhere (e.g. for a whole cohort)"""
+        self.historical_data = []
+        self.user_id = user_id
+        self.submissions = None
+        self.current_quiz = current_quiz
+        self.quiz_submission = quiz_submission
+        self.aggregates = aggregates
+        self.current_results = self.score_current_quiz()
+
+    def load_from_store(self, store: 'SubmissionStore', user_id: str, current_quiz: Dict = None,
+                        quiz_submission: Dict = None):
+        """Initialize from a student's history in a SubmissionStore (indexed queries, per-topic totals summed in SQL)"""
+        aggregates = store.aggregates(user_id)
+        if aggregates is None:
+            raise KeyError(user_id)
+        self.load_aggregates(aggregates, current_quiz, quiz_submission, user_id=user_id)
+
+    def add_submission(self, submission: Union[Dict, SubmissionRecord]) -> Dict[str, Any]:
+        """Apply one new quiz attempt to the running aggregates and return the updated persona"""
+        # historical_data and the columnar table keep reflecting load_data; only the aggregates move forward
+        self.aggregates.add(submission)
+        return self.generate_student_persona()
+
+    def score_current_quiz(self) -> Optional[Dict[str, Any]]:
+        """Score the current quiz submission question by question using its response_map
+
+        None (the current quiz is left out, as before question-level scoring) if the submission is
+        for another quiz or the quiz has no question definitions and is not cached.
+        """
+        if not self.current_quiz or not self.quiz_submission:
+            return None
+        try:
+            index = self.scorer.index_for(self.current_quiz)
+        except KeyError:
+            return None
+        if str(self.quiz_submission.get('quiz_id')) != str(index.quiz_id):
+            return None
+        return index.score(submission_responses(self.quiz_submission))
+
+    def _topic_performance(self) -> Dict[str, Dict[str, int]]:
+        """Per-topic correct/total counts over the history plus the scored current quiz"""
+        topic_performance = {
+            topic: {'total_questions': total, 'correct_answers': self.aggregates.topic_correct[topic]}
+            for topic, total in self.aggregates.topic_total.items()
+        }
+        if self.current_results:
+            for result in self.current_results['topics']:
+                stats = topic_performance.setdefault(result['topic'], {'total_questions': 0, 'correct_answers': 0})
+                stats['total_questions'] += result['total_questions']
+                stats['correct_answers'] += result['correct']
+        return topic_performance
+
+    def _topic_peer_percentile(self, topic: str, accuracy: float) -> Optional[float]:
+        """Percentile of a topic accuracy among peer attempts at that topic (None without a peer index)"""
+        if self.peers is None:
+            return None
+        return self.peers.percentile('topic', topic, 'correct_rate', accuracy)
         
     def analyze_performance_trends(self) -> Dict[str, Any]:
         """Analyze performance trends across quizzes"""
-        trends = {
-            'accuracy_trend': [],
-            'topics': defaultdict(list),
-            'average_score': 0,
-            'improvement_rate': 0
+        aggregates = self.aggregates
+        topics = defaultdict(list)
+        for topic, scores in aggregates.topic_scores.items():
+            topics[topic].extend(scores)
+
+        return {
+            'accuracy_trend': list(aggregates.accuracy_trend),
+            'topics': topics,
+            'average_score': aggregates.average_score,
+            'improvement_rate': aggregates.improvement_rate
         }
-        
-        for quiz in self.historical_data:
-            accuracy = float(quiz['accuracy'].strip(' %'))
-            topic = quiz['quiz']['topic']
-            score = quiz['score']
-            
-            trends['accuracy_trend'].append(accuracy)
-            trends['topics'][topic].append(score)
-        
-        # Calculate averages and trends
-        trends['average_score'] = sum(quiz['score'] for quiz in self.historical_data) / len(self.historical_data)
-        
-        # Calculate improvement rate
-        if len(trends['accuracy_trend']) >= 2:
-            initial = trends['accuracy_trend'][0]
-            final = trends['accuracy_trend'][-1]
-            trends['improvement_rate'] = ((final - initial) / initial) * 100
-            
-        return trends
 
     def identify_weak_areas(self) -> List[Dict[str, Any]]:
         """Identify topics and concepts where student needs improvement"""
-        topic_performance = defaultdict(lambda: {'total_questions': 0, 'correct_answers': 0})
-        
-        for quiz in self.historical_data:
-            topic = quiz['quiz']['topic']
-            correct = quiz['correct_answers']
-            total = quiz['total_questions']
-            
-            topic_performance[topic]['total_questions'] += total
-            topic_performance[topic]['correct_answers'] += correct
-        
         weak_areas = []
-        for topic, stats in topic_performance.items():
-            accuracy = (stats['correct_answers'] / stats['total_questions']) * 100
-            if accuracy < 70:  # Threshold for weak areas
-                weak_areas.append({
+        for topic, stats in self._topic_performance().items():
+            accuracy = correct_rate(stats['correct_answers'], stats['total_questions'])
+            percentile = self._topic_peer_percentile(topic, accuracy)
+            behind_peers = percentile is not None and percentile < PEER_WEAK_PERCENTILE and accuracy < 80
+            if accuracy < 70 or behind_peers:  # Threshold for weak areas
+                area = {
                     'topic': topic,
                     'accuracy': accuracy,
                     'total_attempts': stats['total_questions']
-                })
+                }
+                if self.peers is not None:
+                    area['peer_percentile'] = round(percentile, 2) if percentile is not None else None
+                weak_areas.append(area)
                 
         return sorted(weak_areas, key=lambda x: x['accuracy'])
 
     def generate_student_persona(self) -> Dict[str, Any]:
         """Generate a student persona based on performance patterns"""
-        trends = self.analyze_performance_trends()
-        
         persona = {
             'learning_style': self._determine_learning_style(),
             'consistency_score': self._calculate_consistency(),
             'strength_areas': self._identify_strengths(),
             'improvement_needed': self.identify_weak_areas(),
-            'performance_level': self._determine_performance_level(trends['average_score'])
+            'performance_level': self._determine_performance_level(self.aggregates.average_score),
+            'recent_performance': self._recent_performance(),
+            'peer_comparison': self._peer_comparison()
         }
         
         return persona
 
+    def _recent_performance(self) -> Dict[str, Any]:
+        """Rolling-window and recency-weighted accuracy over the chronologically sorted history"""
+        last_attempts = self.aggregates.recent_attempts()
+        last_days = self.aggregates.recent_days()
+        return {
+            'last_attempts': {**last_attempts, 'average_accuracy': round(last_attempts['average_accuracy'], 2)},
+            'last_days': {**last_days, 'average_accuracy': round(last_days['average_accuracy'], 2)},
+            'weighted_topic_accuracy': {
+                topic: round(accuracy, 2) for topic, accuracy in self.aggregates.weighted_topic_accuracy().items()
+            }
+        }
+
+    def _peer_comparison(self) -> Dict[str, Any]:
+        """Percentile standing against the cohort per topic and for the current quiz (None without a peer index)"""
+        if self.peers is None:
+            return None
+        def rounded(percentile: Optional[float]) -> Optional[float]:
+            return round(percentile, 2) if percentile is not None else None
+
+        topics = {
+            topic: rounded(self._topic_peer_percentile(
+                topic, correct_rate(stats['correct_answers'], stats['total_questions'])
+            ))
+            for topic, stats in self._topic_performance().items()
+        }
+        current_quiz = None
+        if self.quiz_submission:
+            submission = as_submission_record(self.quiz_submission, keep_responses=False)
+            current_quiz = {
+                **{metric: rounded(value) for metric, value in self.peers.submission_percentiles(submission).items()},
+                'better_than': submission.better_than,
+                'rank': parse_rank(submission.rank_text)
+            }
+        return {'topics': topics, 'current_quiz': current_quiz}
+
     def _determine_learning_style(self) -> str:
         """Determine student's learning style based on patterns"""
-        speed_scores = [float(quiz.get('speed', 0)) for quiz in self.historical_data]
-        accuracy_scores = [float(quiz['accuracy'].strip(' %')) for quiz in self.historical_data]
-        
-        avg_speed = sum(speed_scores) / len(speed_scores)
-        avg_accuracy = sum(accuracy_scores) / len(accuracy_scores)
+        avg_speed = self.aggregates.average_speed
+        avg_accuracy = self.aggregates.average_accuracy
         
         if avg_speed > 90 and avg_accuracy > 80:
             return "Fast and Accurate"
@@ -101,8 +499,8 @@ class StudentAnalyzer:
 
     def generate_recommendations(self) -> Dict[str, Any]:
         """Generate personalized recommendations based on analysis"""
-        weak_areas = self.identify_weak_areas()
         persona = self.generate_student_persona()
+        weak_areas = persona['improvement_needed']
         trends = self.analyze_performance_trends()
         
         recommendations = {
@@ -111,21 +509,54 @@ class StudentAnalyzer:
             'improvement_strategies': self._suggest_strategies(persona),
             'next_steps': self._suggest_next_steps(trends)
         }
+        if self.similar is not None:
+            recommendations['students_like_you'] = self._recommend_from_similar_students()
         
         return recommendations
 
+    def _recommend_from_similar_students(self) -> Dict[str, Any]:
+        """Topics that the most similar students improved on, with practice questions when calibrated"""
+        suggestion = self.similar.recommend(self.aggregates, self.user_id)
+        if self.difficulty is not None:
+            accuracy = self.aggregates.topic_accuracy()
+            for entry in suggestion['topics']:
+                area = {'topic': entry['topic'], 'accuracy': accuracy.get(entry['topic'], 0.0)}
+                entry.update(self._pick_practice_questions(area, 10))
+        return suggestion
+
     def _create_practice_plan(self, weak_areas: List[Dict], persona: Dict) -> List[Dict]:
         """Create a personalized practice plan"""
         plan = []
         for area in weak_areas:
-            plan.append({
+            entry = {
                 'topic': area['topic'],
                 'recommended_questions': 20 if area['accuracy'] < 50 else 10,
                 'focus_areas': ['Basic Concepts', 'Practice Problems'] if area['accuracy'] < 50 else ['Advanced Problems'],
                 'estimated_time': '2 hours' if area['accuracy'] < 50 else '1 hour'
-            })
+            }
+            if self.difficulty is not None:
+                entry.update(self._pick_practice_questions(area, entry['recommended_questions']))
+            plan.append(entry)
         return plan
 
+    def _pick_practice_questions(self, area: Dict, count: int) -> Dict[str, Any]:
+        """Concrete question ids for a weak topic at the difficulty the student should practice"""
+        success_rate = FOUNDATION_SUCCESS_RATE if area['accuracy'] < 50 else ADVANCED_SUCCESS_RATE
+        target = self.difficulty.target_difficulty(area['topic'], area['accuracy'], success_rate)
+        if target is None:
+            return {'question_ids': [], 'target_difficulty': None}
+        return {
+            'question_ids': self.difficulty.pick_questions(area['topic'], target, count, self._answered_questions()),
+            'target_difficulty': difficulty_level(target)
+        }
+
+    def _answered_questions(self) -> Set[int]:
+        """Question ids in the current quiz submission and in this student's attempts known to the calibrator"""
+        answered = self.difficulty.answered_questions(self.user_id) if self.user_id is not None else set()
+        if self.quiz_submission:
+            answered.update(as_submission_record(self.quiz_submission).question_ids or ())
+        return answered
+
     def _suggest_strategies(self, persona: Dict) -> List[str]:
         """Suggest learning strategies based on persona"""
         strategies = []
@@ -145,14 +576,11 @@ class StudentAnalyzer:
 
     def _calculate_consistency(self) -> float:
         """Calculate student's consistency in performance"""
-        scores = [quiz['score'] for quiz in self.historical_data]
-        if not scores:
+        if not self.aggregates.count:
             return 0.0
         
-        # Calculate standard deviation of scores
-        mean = sum(scores) / len(scores)
-        variance = sum((x - mean) ** 2 for x in scores) / len(scores)
-        std_dev = variance ** 0.5
+        # Standard deviation of scores, precomputed at load time
+        std_dev = self.aggregates.score_std
         
         # Convert to consistency score (100 - normalized std dev)
         max_std_dev = 100  # maximum possible standard deviation
@@ -161,20 +589,12 @@ class StudentAnalyzer:
 
     def _identify_strengths(self) -> List[str]:
         """Identify areas where student excels"""
-        topic_performance = defaultdict(lambda: {'total_questions': 0, 'correct_answers': 0})
-        
-        for quiz in self.historical_data:
-            topic = quiz['quiz']['topic']
-            correct = quiz['correct_answers']
-            total = quiz['total_questions']
-            
-            topic_performance[topic]['total_questions'] += total
-            topic_performance[topic]['correct_answers'] += correct
-        
         strengths = []
-        for topic, stats in topic_performance.items():
-            accuracy = (stats['correct_answers'] / stats['total_questions']) * 100
-            if accuracy >= 80:  # Threshold for strength areas
+        for topic, stats in self._topic_performance().items():
+            accuracy = correct_rate(stats['correct_answers'], stats['total_questions'])
+            percentile = self._topic_peer_percentile(topic, accuracy)
+            ahead_of_peers = percentile is not None and percentile >= PEER_STRENGTH_PERCENTILE and accuracy >= 70
+            if accuracy >= 80 or ahead_of_peers:  # Threshold for strength areas
                 strengths.append(topic)
                 
         return strengths
@@ -0,0 +1,324 @@
+"""SQLite store of submissions, quiz definitions and per-question responses
+
+Submissions are bulk-loaded from the existing JSON exports and indexed by user, quiz, topic and
+submission time, so one student's history or per-topic totals take a few index lookups instead
+of a scan of every export. Topics are matched and grouped on their normalized key (see
+topic_taxonomy), so differently spelled labels from separate imports stay one topic. Quiz
+definitions are kept in a QuizCatalog in the same database.
+
+    python submission_store.py --db data/submissions.sqlite --quiz data/LLQT.json --historical data/XgAgFJ.json
+"""
+import argparse
+import json
+import math
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Dict, List, Any, Iterable, Optional, Tuple, Union, IO
+
+import numpy as np
+
+from quiz_cache import QuizCatalog
+from quiz_scoring import QuizIndex
+from records import QuizInterner, QuizRecord, SubmissionRecord, as_submission_records
+from student_recommendations import PerformanceAggregates, RECENCY_EPOCH, recency_weights
+from submission_stream import iter_submissions
+from topic_taxonomy import default_taxonomy, topic_key
+
+DEFAULT_STORE_PATH = os.path.join('.cache', 'submissions.sqlite')
+INSERT_BATCH = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quiz_revisions (
+    quiz_id INTEGER NOT NULL,
+    updated_at TEXT NOT NULL,
+    title TEXT,
+    topic TEXT,
+    questions_count INTEGER,
+    correct_answer_marks REAL,
+    negative_marks REAL,
+    PRIMARY KEY (quiz_id, updated_at)
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    row_id INTEGER PRIMARY KEY,
+    submission_id INTEGER UNIQUE,
+    user_id TEXT,
+    quiz_id INTEGER,
+    quiz_updated_at TEXT,
+    topic TEXT,
+    topic_key TEXT,
+    submitted_at REAL,
+    score NUMERIC,
+    accuracy REAL,
+    speed REAL,
+    final_score REAL,
+    negative_score REAL,
+    correct_answers INTEGER,
+    incorrect_answers INTEGER,
+    total_questions INTEGER,
+    better_than INTEGER,
+    rank_text TEXT,
+    duration INTEGER
+);
+CREATE INDEX IF NOT EXISTS submissions_user ON submissions (user_id, submitted_at);
+CREATE INDEX IF NOT EXISTS submissions_quiz ON submissions (quiz_id);
+CREATE INDEX IF NOT EXISTS submissions_topic_key ON submissions (topic_key);
+CREATE INDEX IF NOT EXISTS submissions_time ON submissions (submitted_at);
+CREATE TABLE IF NOT EXISTS responses (
+    row_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    option_id INTEGER NOT NULL,
+    PRIMARY KEY (row_id, question_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS responses_question ON responses (question_id);
+"""
+
+SUBMISSION_FIELDS = [
+    'submission_id', 'user_id', 'quiz_id', 'quiz_updated_at', 'topic', 'topic_key', 'submitted_at', 'score',
+    'accuracy', 'speed', 'final_score', 'negative_score', 'correct_answers', 'incorrect_answers', 'total_questions',
+    'better_than', 'rank_text', 'duration',
+]
+# Attempts are returned in the order normalize_submissions uses: by time, untimed attempts last
+HISTORY_ORDER = "ORDER BY submitted_at IS NULL, submitted_at, row_id"
+
+
+def _submission_row(row_id: int, submission: SubmissionRecord) -> Tuple:
+    return (
+        row_id, submission.id, submission.user_id, submission.quiz_id, submission.quiz.updated_at, submission.topic,
+        topic_key(submission.topic), submission.submitted_at, submission.score, submission.accuracy, submission.speed,
+        submission.final_score, submission.negative_score, submission.correct_answers, submission.incorrect_answers,
+        submission.total_questions, submission.better_than, submission.rank_text, submission.duration,
+    )
+
+
+class SubmissionStore:
+    """Indexed SQLite tables of submissions and responses, plus the quiz catalog"""
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(SCHEMA)
+        self.catalog = QuizCatalog(path)
+
+    def close(self):
+        self.catalog.close()
+        self._connection.close()
+
+    def add_quiz(self, quiz: Union[Dict, QuizIndex]) -> QuizIndex:
+        """Store a quiz definition (as in data/LLQT.json) for scoring and difficulty calibration"""
+        return self.catalog.put(quiz)
+
+    def ingest(self, submissions: Iterable[Union[Dict, SubmissionRecord]], keep_responses: bool = True) -> int:
+        """Bulk-insert submissions in one transaction; ones whose id is already stored are skipped
+
+        Returns the number of submissions added.
+        """
+        added = 0
+        batch: List[SubmissionRecord] = []
+        with self._lock, self._connection:
+            next_row = self._connection.execute("SELECT COALESCE(MAX(row_id), 0) + 1 FROM submissions").fetchone()[0]
+            for submission in as_submission_records(submissions, keep_responses):
+                batch.append(submission)
+                if len(batch) >= INSERT_BATCH:
+                    added += self._insert(batch, next_row + added)
+                    batch = []
+            if batch:
+                added += self._insert(batch, next_row + added)
+        return added
+
+    def ingest_file(self, source: Union[str, IO], keep_responses: bool = True) -> int:
+        """Stream a JSON array or JSON-lines export into the store"""
+        return self.ingest(iter_submissions(source, keep_responses), keep_responses)
+
+    def _insert(self, batch: List[SubmissionRecord], first_row: int) -> int:
+        ids = [submission.id for submission in batch if submission.id is not None]
+        stored = set()
+        for start in range(0, len(ids), INSERT_BATCH):
+            chunk = ids[start:start + INSERT_BATCH]
+            stored.update(row[0] for row in self._connection.execute(
+                f"SELECT submission_id FROM submissions WHERE submission_id IN ({','.join('?' * len(chunk))})", chunk
+            ))
+
+        rows, responses, revisions = [], [], {}
+        for submission in batch:
+            if submission.id is not None:
+                if submission.id in stored:
+                    continue
+                stored.add(submission.id)
+            row_id = first_row + len(rows)
+            rows.append(_submission_row(row_id, submission))
+            responses.extend((row_id, question_id, option_id) for question_id, option_id in submission.responses())
+            quiz = submission.quiz
+            revisions[(quiz.id, quiz.updated_at)] = (
+                quiz.id, quiz.updated_at or '', quiz.title, quiz.topic, quiz.questions_count, quiz.correct_answer_marks,
+                quiz.negative_marks,
+            )
+
+        self._connection.executemany(
+            f"INSERT INTO submissions (row_id, {', '.join(SUBMISSION_FIELDS)}) "
+            f"VALUES ({', '.join('?' * (len(SUBMISSION_FIELDS) + 1))})", rows
+        )
+        self._connection.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", responses)
+        self._connection.executemany("INSERT OR IGNORE INTO quiz_revisions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                     revisions.values())
+        return len(rows)
+
+    def _query(self, sql: str, parameters: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def user_ids(self) -> List[str]:
+        return [row[0] for row in self._query("SELECT DISTINCT user_id FROM submissions ORDER BY user_id")]
+
+    def submission_count(self, user_id: str = None) -> int:
+        if user_id is None:
+            return self._query("SELECT COUNT(*) FROM submissions")[0][0]
+        return self._query("SELECT COUNT(*) FROM submissions WHERE user_id = ?", (user_id,))[0][0]
+
+    def _records(self, where: str, parameters: Tuple, keep_responses: bool) -> List[SubmissionRecord]:
+        rows = self._query(
+            f"SELECT s.row_id, {', '.join('s.' + field for field in SUBMISSION_FIELDS)}, "
+            "q.title, q.questions_count, q.correct_answer_marks, q.negative_marks "
+            "FROM submissions s LEFT JOIN quiz_revisions q "
+            "ON q.quiz_id = s.quiz_id AND q.updated_at = COALESCE(s.quiz_updated_at, '') "
+            f"WHERE {where} ORDER BY s.submitted_at IS NULL, s.submitted_at, s.row_id",
+            parameters
+        )
+        interner = QuizInterner()
+        records = []
+        for row_id, *values in rows:
+            fields = dict(zip(SUBMISSION_FIELDS, values))
+            title, questions_count, correct_answer_marks, negative_marks = values[len(SUBMISSION_FIELDS):]
+            submission = SubmissionRecord()
+            submission.id = fields['submission_id']
+            for field in ('quiz_id', 'user_id', 'submitted_at', 'score', 'accuracy', 'speed', 'final_score',
+                          'negative_score', 'correct_answers', 'incorrect_answers', 'total_questions',
+                          'better_than', 'rank_text', 'duration'):
+                setattr(submission, field, fields[field])
+            submission.quiz = interner.intern(QuizRecord(
+                fields['quiz_id'], title, default_taxonomy.canonical(fields['topic']), fields['quiz_updated_at'],
+                questions_count,
+                correct_answer_marks, negative_marks,
+            ))
+            records.append((row_id, submission))
+
+        if keep_responses and records:
+            responses = self._responses([row_id for row_id, _ in records])
+            for row_id, submission in records:
+                pairs = responses.get(row_id)
+                if pairs:
+                    submission.question_ids, submission.option_ids = pairs
+        return [submission for _, submission in records]
+
+    def _responses(self, row_ids: List[int]) -> Dict[int, Tuple]:
+        responses: Dict[int, Tuple] = {}
+        for start in range(0, len(row_ids), INSERT_BATCH):
+            chunk = row_ids[start:start + INSERT_BATCH]
+            for row_id, question_id, option_id in self._query(
+                f"SELECT row_id, question_id, option_id FROM responses WHERE row_id IN ({','.join('?' * len(chunk))})",
+                tuple(chunk)
+            ):
+                questions, options = responses.setdefault(row_id, (array('q'), array('q')))
+                questions.append(question_id)
+                options.append(option_id)
+        return responses
+
+    def user_submissions(self, user_id: str, keep_responses: bool = False) -> List[SubmissionRecord]:
+        """A student's submissions in chronological order"""
+        return self._records("s.user_id = ?", (user_id,), keep_responses)
+
+    def quiz_submissions(self, quiz_id: Any, keep_responses: bool = True) -> List[SubmissionRecord]:
+        """All attempts at one quiz, e.g. to calibrate its question difficulty"""
+        return self._records("s.quiz_id = ?", (quiz_id,), keep_responses)
+
+    def topic_submissions(self, topic: str) -> List[SubmissionRecord]:
+        return self._records("s.topic_key = ?", (topic_key(topic),), False)
+
+    def topic_totals(self, user_id: str) -> Dict[str, Tuple[int, int]]:
+        """(correct answers, total questions) per canonical topic, summed by SQLite over the user index"""
+        return {
+            default_taxonomy.canonical(topic): (correct, total)
+            for topic, correct, total in self._query(
+                "SELECT MIN(topic), SUM(correct_answers), SUM(total_questions) FROM submissions "
+                "WHERE user_id = ? GROUP BY topic_key", (user_id,)
+            )
+        }
+
+    def aggregates(self, user_id: str) -> Optional[PerformanceAggregates]:
+        """PerformanceAggregates of one student, or None if they have no submissions
+
+        Counts and per-topic totals are summed in SQL; only the chronological columns the trend
+        rules need are read row by row.
+        """
+        count, score_sum, speed_sum, accuracy_sum = self._query(
+            "SELECT COUNT(*), TOTAL(score), TOTAL(speed), TOTAL(accuracy) FROM submissions WHERE user_id = ?",
+            (user_id,)
+        )[0]
+        if not count:
+            return None
+        rows = self._query(
+            f"SELECT topic, score, accuracy, submitted_at, correct_answers, total_questions FROM submissions "
+            f"WHERE user_id = ? {HISTORY_ORDER}", (user_id,)
+        )
+        topic_totals = self.topic_totals(user_id)
+        topics = [default_taxonomy.canonical(row[0]) for row in rows]
+
+        aggregates = PerformanceAggregates()
+        aggregates.count = count
+        aggregates.score_sum = score_sum
+        aggregates.speed_sum = speed_sum
+        aggregates.accuracy_sum = accuracy_sum
+        mean = aggregates.score_mean
+        aggregates.score_m2 = math.fsum((row[1] - mean) ** 2 for row in rows)
+
+        # Untimed attempts take the student's latest timestamp, as in normalize_submissions
+        latest = None
+        times = []
+        for row in rows:
+            latest = row[3] if row[3] is not None else latest
+            times.append(latest if latest is not None else RECENCY_EPOCH)
+        weights = recency_weights(np.asarray(times, dtype=np.float64)).tolist()
+
+        for (_, score, accuracy, _, correct, total), topic, submitted_at, weight in zip(rows, topics, times, weights):
+            aggregates.accuracy_trend.append(accuracy)
+            aggregates.attempt_times.append(submitted_at)
+            aggregates.accuracy_prefix.append(aggregates.accuracy_prefix[-1] + accuracy)
+            if topic not in aggregates.topic_total:
+                aggregates.topic_correct[topic], aggregates.topic_total[topic] = topic_totals[topic]
+                aggregates.topic_scores[topic] = []
+                aggregates.topic_times[topic] = []
+                aggregates.topic_weighted_correct[topic] = 0.0
+                aggregates.topic_weighted_total[topic] = 0.0
+            aggregates.topic_scores[topic].append(score)
+            aggregates.topic_times[topic].append(submitted_at)
+            aggregates.topic_weighted_correct[topic] += weight * correct
+            aggregates.topic_weighted_total[topic] += weight * total
+        return aggregates
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Load quizzes and submission exports into the SQLite store")
+    parser.add_argument('--db', default=DEFAULT_STORE_PATH)
+    parser.add_argument('--quiz', nargs='*', default=[], help="Quiz definition files")
+    parser.add_argument('--historical', nargs='*', default=[], help="Submission exports (JSON array or JSON lines)")
+    parser.add_argument('--no-responses', action='store_true', help="Skip per-question responses")
+    args = parser.parse_args(argv)
+
+    store = SubmissionStore(args.db)
+    for path in args.quiz:
+        with open(path, 'rb') as fp:
+            store.add_quiz(json.load(fp))
+    added = sum(store.ingest_file(path, keep_responses=not args.no_responses) for path in args.historical)
+    print(json.dumps({'added': added, 'submissions': store.submission_count(), 'db': args.db}))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
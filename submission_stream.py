@@ -0,0 +1,146 @@
+import codecs
+import json
+from typing import Dict, List, Any, Iterable, Iterator, IO, Union
+
+from student_recommendations import PerformanceAggregates, normalize_submissions
+from peer_index import PercentileIndex
+from records import QuizInterner, SubmissionRecord
+from cohort_analysis import CohortAnalyzer, aggregate_by_user
+
+READ_SIZE = 1 << 16
+
+
+def _iter_text(source: IO, read_size: int) -> Iterator[str]:
+    """Read a text or binary file object in chunks, decoding bytes as UTF-8"""
+    decoder = None
+    while True:
+        chunk = source.read(read_size)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            decoder = decoder or codecs.getincrementaldecoder('utf-8-sig')()
+            chunk = decoder.decode(chunk)
+        yield chunk
+    if decoder is not None:
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+def iter_json_records(source: IO, read_size: int = READ_SIZE) -> Iterator[Any]:
+    """Incrementally parse a JSON array, JSON-lines or a single JSON value without loading the whole file
+
+    For a top-level array each element is yielded; otherwise every top-level value is yielded.
+    """
+    decoder = json.JSONDecoder()
+    chunks = _iter_text(source, read_size)
+    buffer = ''
+    pos = 0
+    eof = False
+    in_array = None
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    while True:
+        while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] == ',')):
+            pos += 1
+        if pos == len(buffer):
+            if eof or not fill():
+                break
+            continue
+
+        if in_array is None:
+            in_array = buffer[pos] == '['
+            if in_array:
+                pos += 1
+            continue
+        if in_array and buffer[pos] == ']':
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof or not fill():
+                raise
+            continue
+        if end == len(buffer) and not eof:
+            # A scalar may continue in the next chunk; only trust it once more input is seen
+            if fill():
+                continue
+        yield value
+        pos = end
+
+    if in_array:
+        raise ValueError("Unterminated JSON array")
+
+
+def compact_submission(record: Dict, interner: QuizInterner, keep_responses: bool = True) -> SubmissionRecord:
+    """Reduce a raw submission to a SubmissionRecord sharing the interned quiz summary"""
+    return SubmissionRecord.from_dict(record, interner, keep_responses)
+
+
+def iter_submissions(source: Union[str, IO], keep_responses: bool = True,
+                     interner: QuizInterner = None) -> Iterator[SubmissionRecord]:
+    """Stream compact SubmissionRecords from a JSON array or JSON-lines export"""
+    interner = interner or QuizInterner()
+    if isinstance(source, str):
+        with open(source, 'rb') as fp:
+            yield from iter_submissions(fp, keep_responses, interner)
+        return
+    for record in iter_json_records(source):
+        yield compact_submission(record, interner, keep_responses)
+
+
+class StreamingAggregator:
+    """Fold submissions into per-student aggregates in fixed-size batches"""
+
+    def __init__(self, batch_size: int = 10000):
+        self.batch_size = batch_size
+        self.aggregates: Dict[str, PerformanceAggregates] = {}
+        self.peers = PercentileIndex()
+        self._batch: List[SubmissionRecord] = []
+
+    def add(self, submission: SubmissionRecord):
+        self._batch.append(submission)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def extend(self, submissions: Iterable[SubmissionRecord]):
+        for submission in submissions:
+            self.add(submission)
+
+    def flush(self):
+        """Aggregate the pending batch and merge it into the running totals"""
+        if not self._batch:
+            return
+        frame = normalize_submissions(self._batch)
+        self._batch = []
+        batch = aggregate_by_user(frame)
+        self.peers.merge(PercentileIndex.from_frame(frame))
+        for user_id, aggregates in batch.items():
+            existing = self.aggregates.get(user_id)
+            if existing is None:
+                self.aggregates[user_id] = aggregates
+            else:
+                existing.merge(aggregates)
+
+
+def load_cohort(*sources: Union[str, IO], batch_size: int = 10000) -> CohortAnalyzer:
+    """Build a CohortAnalyzer from one or more submission exports without holding them in memory"""
+    aggregator = StreamingAggregator(batch_size)
+    interner = QuizInterner()
+    for source in sources:
+        aggregator.extend(iter_submissions(source, keep_responses=False, interner=interner))
+    aggregator.flush()
+
+    cohort = CohortAnalyzer()
+    cohort.load_aggregates(aggregator.aggregates, aggregator.peers)
+    return cohort
@@ -0,0 +1,88 @@
+"""Canonical topic ids for the topic labels used by quizzes and questions
+
+The exports label one topic in several ways ("Structural Organisation in Animals" on the quiz,
+"structural organisation in animals " on its questions). Every label is interned once: labels
+that match after collapsing whitespace and case folding share one dense integer id and one
+canonical name, the first spelling seen with its case kept and whitespace collapsed. Ids are
+assigned in order of first appearance and only used inside one process, e.g. for the per-topic
+group-bys; anything stored or shared across processes matches topics on topic_key instead.
+A question's source topic_id and the quiz topic it was seen under are recorded on its topic.
+"""
+import threading
+from typing import Dict, List, Any, Iterable, Optional
+
+
+def topic_key(topic: Any) -> Optional[str]:
+    """Comparison key of a topic label: whitespace collapsed and case folded"""
+    if topic is None:
+        return None
+    return ' '.join(str(topic).split()).casefold()
+
+
+class TopicTaxonomy:
+    """Interned table of canonical topics: id -> name, parent id and source topic_id"""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.parents: List[Optional[int]] = []
+        self.source_ids: List[Any] = []
+        self._ids: Dict[str, int] = {}
+        # Exact label -> id, so labels seen before skip normalization
+        self._labels: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def topic_id(self, topic: Any, source_id: Any = None, parent: Any = None) -> Optional[int]:
+        """Id of a topic label (None stays None); source_id is the export's topic_id, parent a broader topic label"""
+        if topic is None:
+            return None
+        if source_id is None and parent is None:
+            known = self._labels.get(topic)
+            if known is not None:
+                return known
+        key = topic_key(topic)
+        parent_id = self.topic_id(parent) if parent is not None else None
+        with self._lock:
+            topic_id = self._ids.get(key)
+            if topic_id is None:
+                topic_id = self._ids[key] = len(self.names)
+                self.names.append(' '.join(str(topic).split()))
+                self.parents.append(None)
+                self.source_ids.append(None)
+            if source_id is not None and self.source_ids[topic_id] is None:
+                self.source_ids[topic_id] = source_id
+            if parent_id is not None and parent_id != topic_id and self.parents[topic_id] is None:
+                self.parents[topic_id] = parent_id
+            self._labels[topic] = topic_id
+        return topic_id
+
+    def canonical(self, topic: Any, source_id: Any = None, parent: Any = None) -> Optional[str]:
+        """Canonical name of a topic label"""
+        topic_id = self.topic_id(topic, source_id, parent)
+        return None if topic_id is None else self.names[topic_id]
+
+    def parent(self, topic: Any) -> Optional[str]:
+        """Canonical name of the broader topic a label was seen under (e.g. a question topic's quiz topic)"""
+        topic_id = self.topic_id(topic)
+        parent_id = self.parents[topic_id] if topic_id is not None else None
+        return None if parent_id is None else self.names[parent_id]
+
+    def codes(self, topics: Iterable[Any]) -> List[int]:
+        """Topic ids of many labels, with -1 for missing topics"""
+        labels = self._labels
+        codes = []
+        for topic in topics:
+            code = labels.get(topic)
+            if code is None:
+                code = self.topic_id(topic)
+            codes.append(-1 if code is None else code)
+        return codes
+
+    def name(self, code: int) -> Optional[str]:
+        """Canonical name of a topic id (None for -1)"""
+        return None if code < 0 else self.names[code]
+
+
+default_taxonomy = TopicTaxonomy()
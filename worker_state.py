@@ -0,0 +1,27 @@
+"""Cohort-wide indexes held by each worker of the report pools
+
+batch_reports, parallel_reports and report_export render many students per task, and every
+student is compared against the whole cohort. The peer index and similar-student index are
+handed to each worker once, through the pool initializer, instead of being pickled with every
+task; tasks run in the calling process (workers == 1) pass them directly instead.
+"""
+from typing import Optional, Tuple
+
+from peer_index import PercentileIndex
+from similar_students import SimilarStudentIndex
+
+_peers: Optional[PercentileIndex] = None
+_similar: Optional[SimilarStudentIndex] = None
+
+
+def init_worker(peers: PercentileIndex = None, similar: SimilarStudentIndex = None):
+    """Pool initializer: keep the cohort's indexes for every task this worker runs"""
+    global _peers, _similar
+    _peers = peers
+    _similar = similar
+
+
+def cohort_indexes(peers: PercentileIndex = None,
+                   similar: SimilarStudentIndex = None) -> Tuple[Optional[PercentileIndex], Optional[SimilarStudentIndex]]:
+    """The given indexes, or the ones this worker was initialized with"""
+    return (peers if peers is not None else _peers), (similar if similar is not None else _similar)